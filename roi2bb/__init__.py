@@ -1,7 +1,13 @@
 from .converter import Converter
+from .shard import ShardWriter, ShardReader
+from .service import ConversionService
+from .store import AnnotationStore
+from .batch import BatchConverter
+from .matching import box_iou_3d, match_boxes, compare_cohort
 
 __version__ = "0.1.0"
 __author__ = "Elham Mahmoudi"
 __email__ = "mahmoudi.elham91@gmail.com"
 
-__all__ = ["Converter"]
+__all__ = ["Converter", "ShardWriter", "ShardReader", "ConversionService", "AnnotationStore", "BatchConverter",
+           "box_iou_3d", "match_boxes", "compare_cohort"]
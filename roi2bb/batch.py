@@ -0,0 +1,372 @@
+import os
+import queue
+import argparse
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from .store import AnnotationStore
+from .utils import (
+    load_image_metadata,
+    compute_image_geometry,
+    generate_class_mapping,
+    get_class_index,
+    get_json_files,
+    load_class_mapping,
+    extract_class_name,
+    read_roi_json,
+    roi_to_yolo_line
+)
+
+# Marks the end of a stage's output
+_DONE = object()
+
+# (patient_id, image_file_path or None, json_folder_path, output_file_path)
+PatientJob = Tuple[str, Optional[str], str, str]
+
+
+class BatchConverter:
+    """
+    Converts a whole cohort with a streaming pipeline and bounded memory.
+
+    Patients are discovered lazily from the ``labels/<patient>/`` folders and
+    flow through discover -> parse -> transform -> write stages connected by
+    bounded queues. A slow stage therefore blocks the stages before it instead
+    of letting work pile up in memory. Each converted patient is appended to
+    an optional checkpoint file, and an interrupted run started again with
+    the same checkpoint skips the patients already completed.
+
+    Attributes:
+        images_dir (str): Folder containing <patient_id>.nii or .nii.gz images
+        labels_dir (str): Folder containing one JSON folder per patient
+        output_dir (str): Folder receiving <patient_id>.txt YOLO files
+        checkpoint_path (Optional[str]): File listing completed patient IDs
+        class_mapping (Optional[Dict[str, int]]): Class mapping shared by all patients.
+                                                  If None, it is generated per patient like Converter does,
+                                                  so the same class ID may mean different classes across patients.
+        annotation_store (Optional[AnnotationStore]): Store used to resolve ROI files
+        max_workers (int): Number of parse threads
+        queue_size (int): Capacity of each queue between stages
+    """
+
+    def __init__(self, images_dir: str, labels_dir: str, output_dir: str, checkpoint_path: Optional[str] = None,
+                 class_mapping: Optional[Dict[str, int]] = None, annotation_store: Optional[AnnotationStore] = None,
+                 max_workers: int = 4, queue_size: int = 16):
+        """
+        Initialize the batch converter.
+
+        Args:
+            images_dir (str): Folder containing <patient_id>.nii or .nii.gz images
+            labels_dir (str): Folder containing one JSON folder per patient
+            output_dir (str): Folder receiving <patient_id>.txt YOLO files
+            checkpoint_path (Optional[str]): File listing completed patient IDs, used to resume
+            class_mapping (Optional[Dict[str, int]]): Class mapping shared by all patients
+            annotation_store (Optional[AnnotationStore]): Store used to resolve ROI files
+            max_workers (int): Number of parse threads
+            queue_size (int): Capacity of each queue between stages
+
+        Raises:
+            FileNotFoundError: If the images or labels folder doesn't exist
+            ValueError: If max_workers or queue_size is less than 1
+        """
+        if not os.path.isdir(images_dir):
+            raise FileNotFoundError(f"Images folder not found: {images_dir}")
+        if not os.path.isdir(labels_dir):
+            raise FileNotFoundError(f"Labels folder not found: {labels_dir}")
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+        if queue_size < 1:
+            raise ValueError(f"queue_size must be at least 1, got {queue_size}")
+
+        self.images_dir = images_dir
+        self.labels_dir = labels_dir
+        self.output_dir = output_dir
+        self.checkpoint_path = checkpoint_path
+        self.class_mapping = class_mapping
+        self.annotation_store = annotation_store
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+
+    def load_checkpoint(self) -> Set[str]:
+        """
+        Returns the patient IDs recorded as completed in the checkpoint file.
+
+        A last line without a trailing newline was cut short by a crash while
+        it was written, so it is ignored.
+        """
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return set()
+        with open(self.checkpoint_path, 'r', encoding='utf-8', newline='') as file:
+            lines = file.read().split("\n")[:-1]
+        return {line.strip() for line in lines if line.strip()}
+
+    def _truncate_partial_checkpoint_line(self) -> None:
+        """
+        Removes an unterminated last line from the checkpoint so new IDs are not appended to it.
+        """
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, 'rb+') as file:
+            content = file.read()
+            if content and not content.endswith(b"\n"):
+                file.truncate(content.rfind(b"\n") + 1)
+
+    def discover(self) -> Iterator[PatientJob]:
+        """
+        Lazily yields one job per patient folder in labels_dir.
+
+        Yields:
+            PatientJob: (patient_id, image path or None if missing, JSON folder, output path)
+        """
+        with os.scandir(self.labels_dir) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                patient_id = entry.name
+                image_file_path = None
+                for extension in (".nii.gz", ".nii"):
+                    candidate = os.path.join(self.images_dir, patient_id + extension)
+                    if os.path.exists(candidate):
+                        image_file_path = candidate
+                        break
+                yield patient_id, image_file_path, entry.path, os.path.join(self.output_dir, patient_id + ".txt")
+
+    def _parse(self, job: PatientJob) -> Dict[str, Any]:
+        """
+        Reads the image geometry and ROI files of one patient.
+        """
+        patient_id, image_file_path, json_folder_path, _ = job
+        if image_file_path is None:
+            raise FileNotFoundError(f"No .nii or .nii.gz image found for {patient_id} in {self.images_dir}")
+
+        topleft, physical_size_mm = compute_image_geometry(load_image_metadata(image_file_path))
+        json_files = get_json_files(json_folder_path)
+        if not json_files:
+            raise ValueError(f"No JSON files found in directory: {json_folder_path}")
+        # Runs on a worker thread, so nothing is printed here; run() reports from the caller's thread
+        if self.class_mapping is not None:
+            class_mapping = self.class_mapping
+        else:
+            class_mapping = generate_class_mapping(json_files, verbose=False)
+
+        rois = []
+        warnings = []
+        for json_file_path in json_files:
+            try:
+                organ_name = extract_class_name(os.path.basename(json_file_path))
+                class_index = get_class_index(organ_name, class_mapping)
+                if class_index == -1:
+                    raise ValueError(f"Unknown class: {organ_name}. Available classes: {list(class_mapping.keys())}")
+                if self.annotation_store is not None:
+                    center, roi_size_mm = self.annotation_store.load_roi(json_file_path)
+                else:
+                    center, roi_size_mm = read_roi_json(json_file_path)
+                rois.append((class_index, center, roi_size_mm))
+            except Exception as e:
+                warnings.append(f"Failed to process {json_file_path}: {str(e)}")
+        if self.annotation_store is not None:
+            self.annotation_store.flush()
+
+        return {"topleft": topleft, "physical_size_mm": physical_size_mm, "rois": rois, "warnings": warnings}
+
+    @staticmethod
+    def _transform(parsed: Dict[str, Any]) -> List[str]:
+        """
+        Converts one patient's parsed ROIs to YOLO lines.
+        """
+        if not parsed["rois"]:
+            raise ValueError("No ROI files could be processed successfully")
+        return [
+            roi_to_yolo_line(class_index, center, roi_size_mm, parsed["topleft"], parsed["physical_size_mm"])
+            for class_index, center, roi_size_mm in parsed["rois"]
+        ]
+
+    @staticmethod
+    def _write(output_file_path: str, lines: List[str]) -> None:
+        """
+        Writes one patient's YOLO file atomically.
+        """
+        temp_path = output_file_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write("\n".join(lines))
+        os.replace(temp_path, output_file_path)
+
+    def results(self) -> Iterator[Dict[str, Any]]:
+        """
+        Runs the pipeline, yielding one result per processed patient as it is written.
+
+        Patients already listed in the checkpoint are skipped. Closing the
+        generator early stops all stages.
+
+        Yields:
+            Dict[str, Any]: {"patient_id", "output_file", "boxes", "warnings", "error"}.
+                            "error" is None on success; failed patients are not checkpointed.
+
+        Raises:
+            Exception: Any unexpected error raised inside a pipeline stage
+        """
+        completed = self.load_checkpoint()
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        parse_queue: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        transform_queue: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        write_queue: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+
+        def put(target: "queue.Queue[Any]", item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(source: "queue.Queue[Any]") -> Any:
+            while not stop.is_set():
+                try:
+                    return source.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def stage(body: Callable[[], None]) -> Callable[[], None]:
+            def run() -> None:
+                try:
+                    body()
+                except BaseException as e:
+                    errors.append(e)
+                    stop.set()
+            return run
+
+        def discover_stage() -> None:
+            try:
+                for job in self.discover():
+                    if job[0] in completed:
+                        continue
+                    if not put(parse_queue, job):
+                        return
+            finally:
+                for _ in range(self.max_workers):
+                    put(parse_queue, _DONE)
+
+        def parse_stage() -> None:
+            while True:
+                job = get(parse_queue)
+                if job is _DONE:
+                    put(transform_queue, _DONE)
+                    return
+                try:
+                    item = (job, self._parse(job), None)
+                except Exception as e:
+                    item = (job, None, e)
+                if not put(transform_queue, item):
+                    return
+
+        def transform_stage() -> None:
+            remaining = self.max_workers
+            while remaining:
+                item = get(transform_queue)
+                if item is _DONE:
+                    remaining -= 1
+                    continue
+                job, parsed, error = item
+                lines, warnings = None, []
+                if error is None:
+                    warnings = parsed["warnings"]
+                    try:
+                        lines = self._transform(parsed)
+                    except Exception as e:
+                        error = e
+                if not put(write_queue, (job, lines, warnings, error)):
+                    return
+            put(write_queue, _DONE)
+
+        threads = [threading.Thread(target=stage(discover_stage), daemon=True)]
+        threads += [threading.Thread(target=stage(parse_stage), daemon=True) for _ in range(self.max_workers)]
+        threads.append(threading.Thread(target=stage(transform_stage), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        self._truncate_partial_checkpoint_line()
+        checkpoint = open(self.checkpoint_path, 'a', encoding='utf-8') if self.checkpoint_path else None
+        try:
+            while True:
+                item = get(write_queue)
+                if item is _DONE:
+                    break
+                (patient_id, _, _, output_file_path), lines, warnings, error = item
+                if error is None:
+                    try:
+                        self._write(output_file_path, lines)
+                    except OSError as e:
+                        error = e
+                if error is None and checkpoint is not None:
+                    checkpoint.write(patient_id + "\n")
+                    checkpoint.flush()
+                yield {
+                    "patient_id": patient_id,
+                    "output_file": output_file_path if error is None else None,
+                    "boxes": len(lines) if error is None else 0,
+                    "warnings": warnings,
+                    "error": str(error) if error is not None else None
+                }
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            if checkpoint is not None:
+                checkpoint.close()
+
+        if errors:
+            raise errors[0]
+
+    def run(self) -> Dict[str, int]:
+        """
+        Runs the full batch conversion, printing warnings and failures as they occur.
+
+        Returns:
+            Dict[str, int]: Counts of "converted" and "failed" patients in this run
+        """
+        summary = {"converted": 0, "failed": 0}
+        for result in self.results():
+            for warning in result["warnings"]:
+                print(f"Warning: {warning}")
+            if result["error"] is not None:
+                summary["failed"] += 1
+                print(f"Warning: Failed to convert {result['patient_id']}: {result['error']}")
+            else:
+                summary["converted"] += 1
+        return summary
+
+
+def main() -> None:
+    """
+    Command-line interface for converting a whole cohort with resumable streaming batches.
+    """
+    parser = argparse.ArgumentParser(description='Convert a cohort of 3D Slicer ROI folders to YOLO 3D format.')
+    parser.add_argument('images_dir', type=str, help='Folder containing <patient_id>.nii or .nii.gz images.')
+    parser.add_argument('labels_dir', type=str, help='Folder containing one ROI JSON folder per patient.')
+    parser.add_argument('output_dir', type=str, help='Folder receiving <patient_id>.txt YOLO files.')
+    parser.add_argument('--class-mapping', type=str, required=True,
+                        help='JSON file mapping class names to class IDs (e.g. {"liver": 0, "kidney": 1}), shared by all patients.')
+    parser.add_argument('--checkpoint', type=str, default=None, help='File recording completed patients; rerun with the same file to resume.')
+    parser.add_argument('--store', type=str, default=None, help='Path to an annotation store database; unchanged ROI files are not re-parsed.')
+    parser.add_argument('--workers', type=int, default=4, help='Number of parse threads (default: 4).')
+    parser.add_argument('--queue-size', type=int, default=16, help='Capacity of the queues between pipeline stages (default: 16).')
+
+    args = parser.parse_args()
+
+    try:
+        class_mapping = load_class_mapping(args.class_mapping)
+        annotation_store = AnnotationStore(args.store) if args.store else None
+        batch = BatchConverter(args.images_dir, args.labels_dir, args.output_dir, checkpoint_path=args.checkpoint,
+                               class_mapping=class_mapping,
+                               annotation_store=annotation_store, max_workers=args.workers, queue_size=args.queue_size)
+        summary = batch.run()
+        print(f'Converted {summary["converted"]} patients ({summary["failed"]} failed) to {args.output_dir}')
+    except Exception as e:
+        print(f'Error: {str(e)}')
+        exit(1)
+
+if __name__ == '__main__':
+    main()
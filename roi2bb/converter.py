@@ -1,14 +1,18 @@
 import os
-import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Tuple
 import nibabel as nib
+from .store import AnnotationStore
 from .utils import (
     load_medical_image,
     generate_class_mapping,
     get_class_index,
     get_json_files,
-    extract_class_name
+    extract_class_name,
+    compute_image_geometry,
+    read_roi_json,
+    roi_to_yolo_line
 )
 
 class Converter:
@@ -26,9 +30,13 @@ class Converter:
         output_file_path (str): Path to save YOLO 3D format output
         yolo_content (List[str]): Stores YOLO 3D format annotations
         class_mapping (Dict[str, int]): Mapping of class names to indices
+        max_workers (Optional[int]): Number of threads used to parse ROI files
+        annotation_store (Optional[AnnotationStore]): Content-addressed store used to resolve ROI files
+        warnings (List[str]): Warnings collected during the last call to process_all_rois
     """
 
-    def __init__(self, image_file_path: str, json_folder_path: str, output_file_path: str, class_mapping: Optional[Dict[str, int]] = None):
+    def __init__(self, image_file_path: str, json_folder_path: str, output_file_path: str, class_mapping: Optional[Dict[str, int]] = None, max_workers: Optional[int] = None,
+                 annotation_store: Optional[AnnotationStore] = None):
         """
         Initialize the converter.
 
@@ -38,10 +46,14 @@ class Converter:
             output_file_path (str): Path to save YOLO 3D format output text file
             class_mapping (Optional[Dict[str, int]]): Custom class name to index mapping.
                                                    If None, auto-generates from JSON files.
+            max_workers (Optional[int]): Number of threads used to parse ROI files.
+                                         If None or 1, files are processed sequentially.
+            annotation_store (Optional[AnnotationStore]): If given, ROI files are resolved through
+                                                          this store and only parsed when their content is new.
         
         Raises:
             FileNotFoundError: If image file or JSON folder doesn't exist
-            ValueError: If image file format is not supported
+            ValueError: If image file format is not supported or max_workers is invalid
         """
         # Validate inputs
         if not os.path.exists(image_file_path):
@@ -50,11 +62,16 @@ class Converter:
             raise FileNotFoundError(f"JSON folder not found: {json_folder_path}")
         if not os.path.isdir(json_folder_path):
             raise ValueError(f"JSON path must be a directory: {json_folder_path}")
+        if max_workers is not None and max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
         
         self.image_file_path = image_file_path
         self.json_folder_path = json_folder_path
         self.output_file_path = output_file_path
+        self.max_workers = max_workers
+        self.annotation_store = annotation_store
         self.yolo_content: List[str] = []
+        self.warnings: List[str] = []
 
         # Load image metadata (resolution, shape, affine transform)
         self.img_data, metadata = load_medical_image(image_file_path)
@@ -62,19 +79,7 @@ class Converter:
         self.image_shape: Optional[Tuple] = metadata.get("shape", None)
         self.affine: Optional[Any] = metadata.get("affine", None)
 
-        if self.image_resolution and self.image_shape:
-            self.image_physical_size_mm = [
-                self.image_shape[i] * self.image_resolution[i] for i in range(len(self.image_shape))
-            ]
-        else:
-            raise ValueError("Could not extract image resolution and shape from the medical image")
-
-        if self.affine is not None:
-            self.topleft = self.affine[:3, 3]  # Extract origin
-            self.topleft[1] *= -1  # Flip Y-axis
-            self.topleft[2] *= -1  # Flip Z-axis
-        else:
-            raise ValueError("Could not extract affine transformation from the medical image")
+        self.topleft, self.image_physical_size_mm = compute_image_geometry(metadata)
 
         # Generate or use provided class mapping
         json_files = get_json_files(self.json_folder_path)
@@ -93,6 +98,23 @@ class Converter:
         Args:
             json_file_path (str): Path to the ROI JSON file
         
+        Raises:
+            FileNotFoundError: If JSON file doesn't exist
+            KeyError: If JSON structure is invalid
+            ValueError: If ROI data is malformed
+        """
+        self.yolo_content.append(self._roi_to_yolo_line(json_file_path))
+
+    def _roi_to_yolo_line(self, json_file_path: str) -> str:
+        """
+        Converts a single ROI JSON file to a YOLO 3D line without modifying state.
+
+        Args:
+            json_file_path (str): Path to the ROI JSON file
+
+        Returns:
+            str: YOLO 3D format line
+        
         Raises:
             FileNotFoundError: If JSON file doesn't exist
             KeyError: If JSON structure is invalid
@@ -107,41 +129,35 @@ class Converter:
         if class_index == -1:
             raise ValueError(f"Unknown class: {organ_name}. Available classes: {list(self.class_mapping.keys())}")
 
-        try:
-            with open(json_file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON format in {json_file_path}: {str(e)}")
-        
-        try:
-            roi = data['markups'][0]
-            center = roi['center']
-            roi_size_mm = roi['size']
-        except (KeyError, IndexError) as e:
-            raise KeyError(f"Invalid ROI JSON structure in {json_file_path}: {str(e)}")
-        
-        if len(center) != 3 or len(roi_size_mm) != 3:
-            raise ValueError(f"Invalid ROI dimensions in {json_file_path}. Expected 3D coordinates.")
+        if self.annotation_store is not None:
+            center, roi_size_mm = self.annotation_store.load_roi(json_file_path)
+        else:
+            center, roi_size_mm = read_roi_json(json_file_path)
+        return roi_to_yolo_line(class_index, center, roi_size_mm, self.topleft, self.image_physical_size_mm)
 
-        # Correct axis directions
-        center[0] = -1 * center[0]
-        center[2] = -1 * center[2]
-        new_center = [self.topleft[i] - center[i] for i in range(3)]
+    def _try_roi_to_yolo_line(self, json_file_path: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Converts a single ROI, returning a warning instead of raising on failure.
 
-        # Normalize coordinates
-        yolo_center = [new_center[i] / self.image_physical_size_mm[i] for i in range(3)]
-        yolo_size = [
-            roi_size_mm[0] / self.image_physical_size_mm[0],
-            roi_size_mm[1] / self.image_physical_size_mm[1],
-            roi_size_mm[2] / self.image_physical_size_mm[2]
-        ]
+        Args:
+            json_file_path (str): Path to the ROI JSON file
 
-        yolo_format = f"{class_index} {yolo_center[2]} {yolo_center[0]} {yolo_center[1]} {yolo_size[2]} {yolo_size[0]} {yolo_size[1]}"
-        self.yolo_content.append(yolo_format)
+        Returns:
+            Tuple[Optional[str], Optional[str]]: (YOLO line, None) on success or (None, warning) on failure
+        """
+        try:
+            return self._roi_to_yolo_line(json_file_path), None
+        except Exception as e:
+            return None, f"Failed to process {json_file_path}: {str(e)}"
 
     def process_all_rois(self) -> None:
         """
         Processes all JSON annotation files in the folder.
+
+        Files are processed in sorted order. When max_workers is greater than 1
+        they are parsed on a thread pool, but results are still appended in
+        sorted order so the output is identical to the sequential path.
+        Failures are collected in self.warnings and reported together.
         
         Raises:
             ValueError: If no JSON files are found or processing fails
@@ -149,15 +165,27 @@ class Converter:
         json_file_list = get_json_files(self.json_folder_path)
         if not json_file_list:
             raise ValueError(f"No JSON files found in {self.json_folder_path}")
-            
+
+        if self.max_workers is not None and self.max_workers > 1 and len(json_file_list) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(self._try_roi_to_yolo_line, json_file_list))
+        else:
+            results = [self._try_roi_to_yolo_line(json_file_path) for json_file_path in json_file_list]
+
+        if self.annotation_store is not None:
+            self.annotation_store.flush()
+
+        self.warnings = []
         processed_count = 0
-        for json_file_path in json_file_list:
-            try:
-                self.convert_single_roi(json_file_path)
-                processed_count += 1
-            except Exception as e:
-                print(f"Warning: Failed to process {json_file_path}: {str(e)}")
+        for yolo_line, warning in results:
+            if warning is not None:
+                self.warnings.append(warning)
                 continue
+            self.yolo_content.append(yolo_line)
+            processed_count += 1
+
+        for warning in self.warnings:
+            print(f"Warning: {warning}")
                 
         if processed_count == 0:
             raise ValueError("No ROI files could be processed successfully")
@@ -212,12 +240,17 @@ def main() -> None:
     parser.add_argument('image_file', type=str, help='Path to the input NIfTI image file (.nii or .nii.gz).')
     parser.add_argument('json_folder', type=str, help='Path to the folder containing the 3D Slicer ROI JSON files.')
     parser.add_argument('output_file', type=str, help='Path to the output YOLO format text file.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of threads used to parse ROI JSON files (default: sequential).')
+    parser.add_argument('--store', type=str, default=None, help='Path to an annotation store database; unchanged ROI files are not re-parsed.')
 
     args = parser.parse_args()
 
     try:
+        annotation_store = AnnotationStore(args.store) if args.store else None
+
         # Initialize the converter
-        converter = Converter(args.image_file, args.json_folder, args.output_file)
+        converter = Converter(args.image_file, args.json_folder, args.output_file, max_workers=args.workers,
+                              annotation_store=annotation_store)
 
         # Run the conversion process
         converter.run()
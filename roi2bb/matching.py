@@ -0,0 +1,300 @@
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from .utils import parse_yolo_lines
+
+# YOLO files, YOLO lines or (n, 7) arrays as produced by Converter / ShardReader
+BoxSource = Union[str, Sequence[str], np.ndarray]
+
+
+def load_boxes(source: BoxSource) -> np.ndarray:
+    """
+    Loads YOLO 3D boxes from a label file, a list of YOLO lines or an array.
+
+    Args:
+        source (BoxSource): Path to a YOLO .txt file, YOLO lines, or an (n, 7) array
+
+    Returns:
+        np.ndarray: Array of shape (n, 7) ("class center_z center_x center_y width height depth")
+
+    Raises:
+        FileNotFoundError: If the label file doesn't exist
+        ValueError: If the boxes are malformed
+    """
+    if isinstance(source, np.ndarray):
+        boxes = np.asarray(source, dtype=np.float64)
+        if boxes.size == 0:
+            return boxes.reshape(0, 7)
+        if boxes.ndim != 2 or boxes.shape[1] != 7:
+            raise ValueError(f"Expected boxes of shape (n, 7), got {boxes.shape}")
+        return boxes
+    if isinstance(source, str):
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"Label file not found: {source}")
+        with open(source, 'r', encoding='utf-8') as file:
+            source = file.read().splitlines()
+    return parse_yolo_lines(source, dtype=np.float64)
+
+
+def box_iou_3d(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Computes the pairwise 3D IoU between two sets of normalized YOLO boxes.
+
+    Args:
+        boxes_a (np.ndarray): Array of shape (n, 7)
+        boxes_b (np.ndarray): Array of shape (m, 7)
+
+    Returns:
+        np.ndarray: IoU matrix of shape (n, m)
+    """
+    centers_a, sizes_a = boxes_a[:, 1:4], boxes_a[:, 4:7]
+    centers_b, sizes_b = boxes_b[:, 1:4], boxes_b[:, 4:7]
+    min_a, max_a = centers_a - sizes_a / 2, centers_a + sizes_a / 2
+    min_b, max_b = centers_b - sizes_b / 2, centers_b + sizes_b / 2
+
+    overlap = np.minimum(max_a[:, None, :], max_b[None, :, :]) - np.maximum(min_a[:, None, :], min_b[None, :, :])
+    intersection = np.prod(np.clip(overlap, 0, None), axis=2)
+    volume_a = np.prod(sizes_a, axis=1)
+    volume_b = np.prod(sizes_b, axis=1)
+    union = volume_a[:, None] + volume_b[None, :] - intersection
+
+    iou = np.zeros_like(intersection)
+    np.divide(intersection, union, out=iou, where=union > 0)
+    return iou
+
+
+def _match_counts(ground_truth: np.ndarray, predictions: np.ndarray,
+                  iou_threshold: float) -> Tuple[List[Tuple[int, int, float]], Dict[int, Dict[str, float]]]:
+    """
+    Greedily matches boxes of the same class by descending IoU.
+
+    Returns:
+        Tuple: (matches as (ground truth index, prediction index, IoU), raw per-class counts)
+    """
+    matches: List[Tuple[int, int, float]] = []
+    counts: Dict[int, Dict[str, float]] = {}
+    gt_classes = ground_truth[:, 0].astype(int)
+    pred_classes = predictions[:, 0].astype(int)
+
+    for class_index in sorted(set(gt_classes.tolist()) | set(pred_classes.tolist())):
+        gt_indices = np.flatnonzero(gt_classes == class_index)
+        pred_indices = np.flatnonzero(pred_classes == class_index)
+        class_counts = {"ground_truth": len(gt_indices), "predictions": len(pred_indices), "matched": 0, "iou_sum": 0.0}
+        counts[class_index] = class_counts
+        if not len(gt_indices) or not len(pred_indices):
+            continue
+
+        iou = box_iou_3d(ground_truth[gt_indices], predictions[pred_indices])
+        # Boxes that do not overlap never match, whatever the threshold
+        rows, cols = np.nonzero((iou >= iou_threshold) & (iou > 0))
+        order = np.argsort(-iou[rows, cols], kind="stable")
+        gt_used = np.zeros(len(gt_indices), dtype=bool)
+        pred_used = np.zeros(len(pred_indices), dtype=bool)
+        for row, col in zip(rows[order], cols[order]):
+            if gt_used[row] or pred_used[col]:
+                continue
+            gt_used[row] = pred_used[col] = True
+            matches.append((int(gt_indices[row]), int(pred_indices[col]), float(iou[row, col])))
+            class_counts["matched"] += 1
+            class_counts["iou_sum"] += float(iou[row, col])
+
+    matches.sort()
+    return matches, counts
+
+
+def _summarize(counts: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Turns raw match counts into precision, recall and mean IoU (None when undefined).
+    """
+    matched = counts["matched"]
+    return {
+        "ground_truth": counts["ground_truth"],
+        "predictions": counts["predictions"],
+        "matched": matched,
+        "precision": matched / counts["predictions"] if counts["predictions"] else None,
+        "recall": matched / counts["ground_truth"] if counts["ground_truth"] else None,
+        "mean_iou": counts["iou_sum"] / matched if matched else None
+    }
+
+
+def _total(counts: Dict[int, Dict[str, float]]) -> Dict[str, float]:
+    total = {"ground_truth": 0, "predictions": 0, "matched": 0, "iou_sum": 0.0}
+    for class_counts in counts.values():
+        for key in total:
+            total[key] += class_counts[key]
+    return total
+
+
+def match_boxes(ground_truth: BoxSource, predictions: BoxSource, iou_threshold: float = 0.5) -> Dict[str, Any]:
+    """
+    Matches two sets of boxes for one patient, class by class.
+
+    Boxes only match boxes of the same class. Candidate pairs with IoU at or
+    above the threshold are accepted greedily from the highest IoU down, and
+    each box is matched at most once.
+
+    Args:
+        ground_truth (BoxSource): Reference boxes (label file, YOLO lines or (n, 7) array)
+        predictions (BoxSource): Boxes to evaluate against the reference
+        iou_threshold (float): Minimum IoU for a match, greater than 0 and at most 1
+
+    Returns:
+        Dict[str, Any]: {"matches": [(gt index, prediction index, IoU), ...],
+                         "per_class": {class: stats}, "overall": stats}, where stats
+                         holds counts, precision, recall and mean_iou
+
+    Raises:
+        ValueError: If the threshold is outside (0, 1] or the boxes are malformed
+    """
+    if not 0.0 < iou_threshold <= 1.0:
+        raise ValueError(f"iou_threshold must be greater than 0 and at most 1, got {iou_threshold}")
+    matches, counts = _match_counts(load_boxes(ground_truth), load_boxes(predictions), iou_threshold)
+    return {
+        "matches": matches,
+        "per_class": {class_index: _summarize(class_counts) for class_index, class_counts in counts.items()},
+        "overall": _summarize(_total(counts))
+    }
+
+
+def _compare_patient(args: Tuple[str, BoxSource, BoxSource, float]) -> Tuple[str, Optional[Dict], Optional[str]]:
+    """
+    Process-pool worker: returns (patient_id, raw per-class counts, error message).
+    """
+    patient_id, ground_truth, predictions, iou_threshold = args
+    try:
+        _, counts = _match_counts(load_boxes(ground_truth), load_boxes(predictions), iou_threshold)
+        return patient_id, counts, None
+    except Exception as e:
+        return patient_id, None, str(e)
+
+
+def compare_cohort(pairs: Dict[str, Tuple[BoxSource, BoxSource]], iou_threshold: float = 0.5,
+                   max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Compares ground truth and predicted boxes for every patient of a cohort.
+
+    Args:
+        pairs (Dict[str, Tuple[BoxSource, BoxSource]]): Patient ID -> (ground truth, predictions).
+                                                        File paths are cheapest to send to worker processes.
+        iou_threshold (float): Minimum IoU for a match, greater than 0 and at most 1
+        max_workers (Optional[int]): Number of worker processes. If None or 1, runs in this process.
+
+    Returns:
+        Dict[str, Any]: {"patients": {patient_id: {"per_class", "overall"}},
+                         "per_class": cohort stats per class, "overall": cohort stats,
+                         "errors": {patient_id: message}}
+
+    Raises:
+        ValueError: If the threshold is outside (0, 1] or max_workers is invalid
+    """
+    if not 0.0 < iou_threshold <= 1.0:
+        raise ValueError(f"iou_threshold must be greater than 0 and at most 1, got {iou_threshold}")
+    if max_workers is not None and max_workers < 1:
+        raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+
+    tasks = [(patient_id, gt, pred, iou_threshold) for patient_id, (gt, pred) in sorted(pairs.items())]
+    if max_workers is not None and max_workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_compare_patient, tasks, chunksize=max(1, len(tasks) // (4 * max_workers))))
+    else:
+        results = [_compare_patient(task) for task in tasks]
+
+    patients: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    cohort_counts: Dict[int, Dict[str, float]] = {}
+    for patient_id, counts, error in results:
+        if error is not None:
+            errors[patient_id] = error
+            continue
+        patients[patient_id] = {
+            "per_class": {class_index: _summarize(class_counts) for class_index, class_counts in counts.items()},
+            "overall": _summarize(_total(counts))
+        }
+        for class_index, class_counts in counts.items():
+            cohort_class = cohort_counts.setdefault(class_index, {"ground_truth": 0, "predictions": 0, "matched": 0, "iou_sum": 0.0})
+            for key in cohort_class:
+                cohort_class[key] += class_counts[key]
+
+    return {
+        "patients": patients,
+        "per_class": {class_index: _summarize(cohort_counts[class_index]) for class_index in sorted(cohort_counts)},
+        "overall": _summarize(_total(cohort_counts)),
+        "errors": errors
+    }
+
+
+def pair_label_folders(ground_truth_dir: str, prediction_dir: str) -> Dict[str, Tuple[BoxSource, BoxSource]]:
+    """
+    Pairs <patient_id>.txt files of two YOLO output folders.
+
+    Patients are taken from both folders. A patient missing from one folder is
+    paired with an empty box set, so its ground truth boxes count as missed or
+    its predicted boxes count as false positives.
+
+    Args:
+        ground_truth_dir (str): Folder of reference YOLO files
+        prediction_dir (str): Folder of YOLO files to evaluate
+
+    Returns:
+        Dict[str, Tuple[BoxSource, BoxSource]]: Patient ID -> (ground truth file, prediction file),
+                                                either side being empty lines when its file is missing
+
+    Raises:
+        FileNotFoundError: If a folder doesn't exist
+    """
+    for folder in (ground_truth_dir, prediction_dir):
+        if not os.path.isdir(folder):
+            raise FileNotFoundError(f"Label folder not found: {folder}")
+
+    filenames = {
+        filename
+        for folder in (ground_truth_dir, prediction_dir)
+        for filename in os.listdir(folder)
+        if filename.endswith(".txt")
+    }
+    pairs: Dict[str, Tuple[BoxSource, BoxSource]] = {}
+    for filename in sorted(filenames):
+        ground_truth_path = os.path.join(ground_truth_dir, filename)
+        prediction_path = os.path.join(prediction_dir, filename)
+        pairs[filename[:-len(".txt")]] = (
+            ground_truth_path if os.path.exists(ground_truth_path) else [],
+            prediction_path if os.path.exists(prediction_path) else []
+        )
+    return pairs
+
+
+def main() -> None:
+    """
+    Command-line interface for comparing two folders of YOLO 3D labels.
+    """
+    parser = argparse.ArgumentParser(description='Compare two folders of YOLO 3D labels with class-aware IoU matching.')
+    parser.add_argument('ground_truth_dir', type=str, help='Folder of reference <patient_id>.txt YOLO files.')
+    parser.add_argument('prediction_dir', type=str, help='Folder of <patient_id>.txt YOLO files to evaluate.')
+    parser.add_argument('--iou', type=float, default=0.5, help='Minimum IoU for a match, in (0, 1] (default: 0.5).')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: single process).')
+    parser.add_argument('--report', type=str, default=None, help='Path to save the full JSON report.')
+
+    args = parser.parse_args()
+
+    try:
+        report = compare_cohort(pair_label_folders(args.ground_truth_dir, args.prediction_dir),
+                                iou_threshold=args.iou, max_workers=args.workers)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+
+        for patient_id, error in report["errors"].items():
+            print(f"Warning: Failed to compare {patient_id}: {error}")
+        for class_index, stats in report["per_class"].items():
+            print(f'class {class_index}: precision={stats["precision"]} recall={stats["recall"]} mean_iou={stats["mean_iou"]}')
+        overall = report["overall"]
+        print(f'overall: precision={overall["precision"]} recall={overall["recall"]} mean_iou={overall["mean_iou"]}')
+    except Exception as e:
+        print(f'Error: {str(e)}')
+        exit(1)
+
+if __name__ == '__main__':
+    main()
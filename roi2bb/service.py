@@ -0,0 +1,610 @@
+import os
+import json
+import stat
+import socket
+import argparse
+import threading
+import socketserver
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+from .utils import (
+    load_image_metadata,
+    compute_image_geometry,
+    generate_class_mapping,
+    get_class_index,
+    get_json_files,
+    extract_class_name,
+    read_roi_json,
+    parse_roi_data,
+    roi_to_yolo_line,
+    yolo_line_to_roi,
+    validate_class_mapping
+)
+
+# Largest request body the HTTP front end reads, in bytes
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+
+class LRUCache:
+    """
+    Thread-safe bounded least-recently-used cache.
+
+    Concurrent requests for the same missing key are coalesced: the value is
+    computed once and every waiting caller receives the same result.
+
+    Attributes:
+        maxsize (int): Maximum number of cached entries
+        hits (int): Number of lookups served from the cache
+        misses (int): Number of lookups that computed a new value
+    """
+
+    def __init__(self, maxsize: int = 128):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize (int): Maximum number of cached entries
+
+        Raises:
+            ValueError: If maxsize is less than 1
+        """
+        if maxsize < 1:
+            raise ValueError(f"Cache size must be at least 1, got {maxsize}")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._pending: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for key, computing and caching it if missing.
+
+        Args:
+            key (Hashable): Cache key
+            compute (Callable[[], Any]): Function producing the value on a cache miss
+
+        Returns:
+            Any: The cached or newly computed value
+
+        Raises:
+            Exception: Any exception raised by compute (failures are not cached)
+        """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = Future()
+                self._pending[key] = pending
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.hits += 1
+
+        if not owner:
+            return pending.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._pending[key]
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        pending.set_result(value)
+        return value
+
+    def clear(self) -> None:
+        """
+        Removes all cached entries.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+def _file_key(path: str) -> Tuple[str, int, int]:
+    """
+    Returns a cache key that changes whenever the file is modified.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+class ConversionService:
+    """
+    Long-lived converter that keeps image geometry, class mappings and parsed
+    ROI JSON files in bounded LRU caches between requests.
+
+    Requests are plain dictionaries (the HTTP server passes the decoded JSON
+    body), so the service can be used in-process or behind ``make_server``.
+    Cache entries are keyed by file path, modification time and size, so
+    edited files are re-read automatically.
+
+    Requests name files on the service host, and ``output_file`` writes to
+    them. Anyone who can reach the service can therefore read and write
+    files with the service's permissions. Set root_dir to confine every
+    request path to one directory tree, and only expose the service to
+    trusted clients.
+
+    Attributes:
+        geometry_cache (LRUCache): Image path -> (topleft, physical size in mm)
+        mapping_cache (LRUCache): JSON folder -> (JSON file list, class mapping)
+        roi_cache (LRUCache): JSON path -> (center, size)
+        max_workers (int): Number of threads used for batch requests
+        root_dir (Optional[str]): If set, request paths must resolve inside this directory
+    """
+
+    def __init__(self, cache_size: int = 256, roi_cache_size: int = 4096, max_workers: int = 4,
+                 root_dir: Optional[str] = None):
+        """
+        Initialize the service.
+
+        Args:
+            cache_size (int): Maximum number of cached images and JSON folders
+            roi_cache_size (int): Maximum number of cached ROI JSON files
+            max_workers (int): Number of threads used for batch requests
+            root_dir (Optional[str]): If set, request paths must resolve inside this directory
+
+        Raises:
+            ValueError: If a cache size or max_workers is less than 1
+            FileNotFoundError: If root_dir doesn't exist
+        """
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+        if root_dir is not None and not os.path.isdir(root_dir):
+            raise FileNotFoundError(f"Service root directory not found: {root_dir}")
+        self.root_dir = os.path.realpath(root_dir) if root_dir is not None else None
+        self.geometry_cache = LRUCache(cache_size)
+        self.mapping_cache = LRUCache(cache_size)
+        self.roi_cache = LRUCache(roi_cache_size)
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def resolve_path(self, path: Any) -> str:
+        """
+        Validates a path from a request against root_dir.
+
+        Args:
+            path (Any): Path taken from a request
+
+        Returns:
+            str: The path, unchanged
+
+        Raises:
+            ValueError: If the path is not a non-empty string
+            PermissionError: If root_dir is set and the path resolves outside it
+        """
+        if not isinstance(path, str) or not path:
+            raise ValueError("Paths must be non-empty strings")
+        if self.root_dir is not None:
+            resolved = os.path.realpath(path)
+            if os.path.commonpath([resolved, self.root_dir]) != self.root_dir:
+                raise PermissionError(f"Path is outside the service root directory: {path}")
+        return path
+
+    def get_geometry(self, image_file_path: str) -> Tuple[np.ndarray, List[float]]:
+        """
+        Returns the cached geometry (topleft, physical size in mm) of an image.
+
+        Raises:
+            FileNotFoundError: If the image file doesn't exist
+        """
+        if not os.path.exists(image_file_path):
+            raise FileNotFoundError(f"Image file not found: {image_file_path}")
+        return self.geometry_cache.get_or_compute(
+            _file_key(image_file_path),
+            lambda: compute_image_geometry(load_image_metadata(image_file_path))
+        )
+
+    def get_folder(self, json_folder_path: str) -> Tuple[List[str], Dict[str, int]]:
+        """
+        Returns the cached JSON file list and auto-generated class mapping of a folder.
+
+        Raises:
+            FileNotFoundError: If the folder doesn't exist
+            ValueError: If the folder contains no JSON files
+        """
+        if not os.path.isdir(json_folder_path):
+            raise FileNotFoundError(f"JSON folder not found: {json_folder_path}")
+
+        def load() -> Tuple[List[str], Dict[str, int]]:
+            json_files = get_json_files(json_folder_path)
+            if not json_files:
+                raise ValueError(f"No JSON files found in directory: {json_folder_path}")
+            return json_files, generate_class_mapping(json_files)
+
+        return self.mapping_cache.get_or_compute(_file_key(json_folder_path), load)
+
+    def get_roi(self, json_file_path: str) -> Tuple[List[float], List[float]]:
+        """
+        Returns the cached ROI (center, size) parsed from a Slicer JSON file.
+
+        Raises:
+            FileNotFoundError: If JSON file doesn't exist
+        """
+        if not os.path.exists(json_file_path):
+            raise FileNotFoundError(f"JSON file not found: {json_file_path}")
+        return self.roi_cache.get_or_compute(_file_key(json_file_path), lambda: read_roi_json(json_file_path))
+
+    def convert(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Converts Slicer ROIs to YOLO 3D lines.
+
+        Request keys:
+            image_file (str): Path to the NIfTI image
+            json_folder (str): Folder of ROI JSON files, or
+            annotations (Dict[str, Dict]): Inline ROI JSON documents keyed by file name
+            class_mapping (Dict[str, int], optional): Custom class mapping
+            output_file (str, optional): If given, the lines are also written to this file
+
+        Returns:
+            Dict[str, Any]: {"lines": [...], "warnings": [...], "class_mapping": {...}}
+
+        Raises:
+            ValueError: If the request is invalid or no ROI could be converted
+        """
+        image_file_path = self.resolve_path(_require(request, "image_file"))
+        output_file_path = request.get("output_file")
+        if output_file_path:
+            self.resolve_path(output_file_path)
+        class_mapping = request.get("class_mapping")
+        if class_mapping is not None:
+            validate_class_mapping(class_mapping, "'class_mapping'")
+        topleft, physical_size_mm = self.get_geometry(image_file_path)
+
+        if "annotations" in request:
+            annotations = request["annotations"]
+            if not isinstance(annotations, dict) or not annotations:
+                raise ValueError("'annotations' must be a non-empty object of file name -> ROI JSON")
+            names = sorted(annotations)
+            if class_mapping is None:
+                class_mapping = generate_class_mapping(names)
+            sources = [(name, lambda name=name: parse_roi_data(annotations[name], name)) for name in names]
+        else:
+            json_files, folder_mapping = self.get_folder(self.resolve_path(_require(request, "json_folder")))
+            if class_mapping is None:
+                class_mapping = folder_mapping
+            sources = [(path, lambda path=path: self.get_roi(path)) for path in json_files]
+
+        lines: List[str] = []
+        warnings: List[str] = []
+        for name, load_roi in sources:
+            try:
+                organ_name = extract_class_name(os.path.basename(name))
+                class_index = get_class_index(organ_name, class_mapping)
+                if class_index == -1:
+                    raise ValueError(f"Unknown class: {organ_name}. Available classes: {list(class_mapping.keys())}")
+                center, roi_size_mm = load_roi()
+                lines.append(roi_to_yolo_line(class_index, center, roi_size_mm, topleft, physical_size_mm))
+            except Exception as e:
+                warnings.append(f"Failed to process {name}: {str(e)}")
+
+        if not lines:
+            raise ValueError(f"No ROI files could be processed successfully: {warnings}")
+
+        if output_file_path:
+            directory = os.path.dirname(output_file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(output_file_path, 'w', encoding='utf-8') as file:
+                file.write("\n".join(lines))
+
+        return {"lines": lines, "warnings": warnings, "class_mapping": class_mapping}
+
+    def reverse_convert(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Converts YOLO 3D lines back to ROIs in Slicer patient coordinates.
+
+        Request keys:
+            image_file (str): Path to the NIfTI image
+            lines (List[str]): YOLO lines, or
+            label_file (str): Path to a YOLO text file
+            class_mapping (Dict[str, int], optional): Used to report class names
+
+        Returns:
+            Dict[str, Any]: {"rois": [{"class_index", "class_name", "center", "size"}, ...]}
+
+        Raises:
+            ValueError: If the request is invalid or a line is malformed. The message
+                        gives the line number only, never the line content.
+        """
+        class_mapping = request.get("class_mapping")
+        if class_mapping is not None:
+            validate_class_mapping(class_mapping, "'class_mapping'")
+        topleft, physical_size_mm = self.get_geometry(self.resolve_path(_require(request, "image_file")))
+
+        if "lines" in request:
+            lines = request["lines"]
+            if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+                raise ValueError("'lines' must be a list of strings")
+        else:
+            label_file_path = self.resolve_path(_require(request, "label_file"))
+            try:
+                with open(label_file_path, 'r', encoding='utf-8') as file:
+                    lines = file.read().splitlines()
+            except UnicodeDecodeError:
+                raise ValueError(f"Label file is not UTF-8 text: {label_file_path}")
+
+        class_names = {index: name for name, index in (class_mapping or {}).items()}
+        rois = []
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                class_index, center, roi_size_mm = yolo_line_to_roi(line, topleft, physical_size_mm)
+            except ValueError:
+                raise ValueError(f"Malformed YOLO line {line_number}: expected 7 numeric values")
+            rois.append({
+                "class_index": class_index,
+                "class_name": class_names.get(class_index),
+                "center": center,
+                "size": roi_size_mm
+            })
+        return {"rois": rois}
+
+    def batch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Runs several convert/reverse requests concurrently on the service thread pool.
+
+        Request keys:
+            requests (List[Dict]): Sub-requests, each with an "action" key
+                                   ("convert" or "reverse") and that action's keys
+
+        Returns:
+            Dict[str, Any]: {"results": [...]} in request order. Failed sub-requests
+                            yield {"error": message} instead of raising.
+        """
+        requests = _require(request, "requests")
+        if not isinstance(requests, list):
+            raise ValueError("'requests' must be a list")
+
+        def run(sub_request: Dict[str, Any]) -> Dict[str, Any]:
+            try:
+                if not isinstance(sub_request, dict):
+                    raise ValueError("Request must be a JSON object")
+                action = sub_request.get("action", "")
+                if action == "batch":
+                    raise ValueError("Nested batch requests are not supported")
+                return self.handle(action, sub_request)
+            except Exception as e:
+                return {"error": str(e)}
+
+        return {"results": list(self._executor.map(run, requests))}
+
+    def handle(self, action: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Dispatches a request to the matching action.
+
+        Args:
+            action (str): "convert", "reverse" or "batch"
+            request (Dict[str, Any]): Request payload
+
+        Returns:
+            Dict[str, Any]: The action's response
+
+        Raises:
+            ValueError: If the action is unknown or the request is not an object
+        """
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object")
+        handlers = {
+            "convert": self.convert,
+            "reverse": self.reverse_convert,
+            "batch": self.batch
+        }
+        if action not in handlers:
+            raise ValueError(f"Unknown action: {action!r}. Expected one of {sorted(handlers)}")
+        return handlers[action](request)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns size and hit/miss counters for each cache.
+        """
+        return {
+            name: {"size": len(cache), "hits": cache.hits, "misses": cache.misses}
+            for name, cache in (("geometry", self.geometry_cache), ("mapping", self.mapping_cache), ("roi", self.roi_cache))
+        }
+
+    def close(self) -> None:
+        """
+        Shuts down the batch thread pool.
+        """
+        self._executor.shutdown(wait=True)
+
+
+def _require(request: Dict[str, Any], key: str) -> Any:
+    if key not in request:
+        raise ValueError(f"Missing required field: {key!r}")
+    return request[key]
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON-over-HTTP front end: POST /convert, /reverse, /batch and GET /health, /stats.
+    """
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send(200, self.server.service.stats())
+        else:
+            self._send(404, {"error": f"Not found: {self.path}"})
+
+    def do_POST(self) -> None:
+        # Check the length before reading: rfile.read(-1) would block until the client disconnects
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_BODY_SIZE:
+            # The unread body is left on the socket, so the connection cannot be reused
+            self.close_connection = True
+            if length < 0:
+                self._send(400, {"error": "Invalid Content-Length header"})
+            else:
+                self._send(413, {"error": f"Request body too large: {length} bytes (limit {MAX_BODY_SIZE})"})
+            return
+
+        try:
+            request = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+        except (ValueError, UnicodeDecodeError) as e:
+            self._send(400, {"error": f"Invalid JSON body: {str(e)}"})
+            return
+
+        try:
+            response = self.server.service.handle(self.path.strip("/"), request)
+        except PermissionError as e:
+            self._send(403, {"error": str(e)})
+            return
+        except (ValueError, KeyError, FileNotFoundError) as e:
+            self._send(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+            return
+        self._send(200, response)
+
+    def _send(self, status: int, body: Dict[str, Any]) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def address_string(self) -> str:
+        # Unix socket clients have no (host, port) address
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: ConversionService, host: str = "127.0.0.1", port: int = 8765,
+                quiet: bool = False) -> HTTPServer:
+    """
+    Creates a threaded HTTP server for a ConversionService.
+
+    Args:
+        service (ConversionService): Service handling the requests
+        host (str): Interface to bind
+        port (int): Port to bind (0 picks a free port)
+        quiet (bool): Suppress per-request logging
+
+    Returns:
+        HTTPServer: Server ready for serve_forever()
+    """
+    server = _ThreadingHTTPServer((host, port), _RequestHandler)
+    server.service = service
+    server.quiet = quiet
+    return server
+
+
+def make_unix_server(service: ConversionService, socket_path: str,
+                     quiet: bool = False) -> socketserver.UnixStreamServer:
+    """
+    Creates a threaded HTTP server listening on a Unix domain socket.
+
+    Args:
+        service (ConversionService): Service handling the requests
+        socket_path (str): Filesystem path of the socket (a stale socket there is replaced)
+        quiet (bool): Suppress per-request logging
+
+    Returns:
+        socketserver.UnixStreamServer: Server ready for serve_forever()
+
+    Raises:
+        RuntimeError: If Unix domain sockets are not supported on this platform
+        FileExistsError: If something other than a socket exists at socket_path
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("Unix domain sockets are not supported on this platform")
+    if os.path.lexists(socket_path):
+        if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+            raise FileExistsError(f"Refusing to replace non-socket file: {socket_path}")
+        os.remove(socket_path)
+    server = _ThreadingUnixHTTPServer(socket_path, _RequestHandler)
+    server.service = service
+    server.quiet = quiet
+    return server
+
+
+def _is_loopback(host: str) -> bool:
+    return host in ("localhost", "127.0.0.1", "::1") or host.startswith("127.")
+
+
+def main() -> None:
+    """
+    Command-line interface for running the roi2bb conversion service.
+
+    Request paths are confined to --root (the current directory by default),
+    and binding to a non-loopback interface requires an explicit --root.
+    """
+    parser = argparse.ArgumentParser(description='Serve roi2bb conversions over HTTP with warm caches.')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to bind (default: 127.0.0.1). Non-loopback hosts require --root.')
+    parser.add_argument('--port', type=int, default=8765, help='Port to bind (default: 8765).')
+    parser.add_argument('--socket', type=str, default=None, help='Listen on this Unix socket path instead of TCP.')
+    parser.add_argument('--root', type=str, default=None, help='Directory that all request paths must resolve under (default: current directory).')
+    parser.add_argument('--cache-size', type=int, default=256, help='Maximum cached images and JSON folders.')
+    parser.add_argument('--roi-cache-size', type=int, default=4096, help='Maximum cached ROI JSON files.')
+    parser.add_argument('--workers', type=int, default=4, help='Threads used for batch requests.')
+
+    args = parser.parse_args()
+
+    try:
+        if not args.socket and args.root is None and not _is_loopback(args.host):
+            raise ValueError(f'Binding to non-loopback host {args.host} requires --root to confine request paths')
+        service = ConversionService(cache_size=args.cache_size, roi_cache_size=args.roi_cache_size,
+                                    max_workers=args.workers, root_dir=args.root or os.getcwd())
+        if args.socket:
+            server = make_unix_server(service, args.socket)
+            print(f'roi2bb service listening on {args.socket} (root: {service.root_dir})')
+        else:
+            server = make_server(service, args.host, args.port)
+            print(f'roi2bb service listening on http://{args.host}:{server.server_address[1]} (root: {service.root_dir})')
+    except Exception as e:
+        print(f'Error: {str(e)}')
+        exit(1)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == '__main__':
+    main()
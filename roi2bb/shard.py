@@ -0,0 +1,330 @@
+import os
+import mmap
+import struct
+import hashlib
+from typing import List, Optional, Sequence, Set, Tuple, Union, Iterator
+import numpy as np
+from .utils import parse_yolo_lines
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+# Header: magic, format version, reserved, index offset, entry count, id table length
+_MAGIC = b"R2BBSHRD"
+_VERSION = 2
+_HEADER = struct.Struct("<8sHHQQQ")
+_RECORD_WIDTH = 7  # class center_z center_x center_y width height depth
+_RECORD_DTYPE = np.dtype("<f4")
+_ALIGNMENT = _RECORD_DTYPE.itemsize
+
+# Fixed-width index entry, sorted by id_hash so lookups bisect the mapped array
+_INDEX_DTYPE = np.dtype([
+    ("id_hash", "<u8"),
+    ("id_offset", "<u8"),
+    ("offset", "<u8"),
+    ("nbytes", "<u8"),
+    ("nrows", "<u8"),
+    ("id_length", "<u4"),
+    ("codec", "<u4")
+])
+_INDEX_ALIGNMENT = 8
+
+CODEC_NONE = "none"
+CODEC_ZSTD = "zstd"
+_CODEC_IDS = {CODEC_NONE: 0, CODEC_ZSTD: 1}
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise ImportError("zstd compression requires the 'zstandard' package: pip install zstandard")
+
+
+def _hash_id(encoded_id: bytes) -> int:
+    """
+    Returns a stable 64-bit hash of an encoded patient ID.
+    """
+    return int.from_bytes(hashlib.blake2b(encoded_id, digest_size=8).digest(), "little")
+
+
+class ShardWriter:
+    """
+    Packs the YOLO 3D labels of many patients into a single binary shard.
+
+    Each patient's boxes are stored as one block of fixed-width little-endian
+    float32 records (7 values per box, in YOLO line order). Blocks can optionally
+    be zstd-compressed. On close, a fixed-width binary index sorted by patient
+    ID hash is written at the end of the file, followed by the encoded IDs.
+
+    If an exception escapes the ``with`` block, the index is not written and
+    the partial shard is rejected by ``ShardReader``.
+
+    Attributes:
+        shard_file_path (str): Path of the shard being written
+        compression (Optional[str]): "zstd" or None
+    """
+
+    def __init__(self, shard_file_path: str, compression: Optional[str] = None, compression_level: int = 3):
+        """
+        Open a new shard for writing.
+
+        Args:
+            shard_file_path (str): Path to the output shard file
+            compression (Optional[str]): "zstd" to compress each block, None to store raw records
+            compression_level (int): zstd compression level
+
+        Raises:
+            ValueError: If the compression codec is not supported
+            ImportError: If zstd compression is requested but zstandard is not installed
+        """
+        if compression not in (None, CODEC_ZSTD):
+            raise ValueError(f"Unsupported compression: {compression}. Expected None or '{CODEC_ZSTD}'")
+        if compression == CODEC_ZSTD:
+            _require_zstandard()
+            self._compressor = zstandard.ZstdCompressor(level=compression_level)
+
+        self.shard_file_path = shard_file_path
+        self.compression = compression
+        self._patient_ids: Set[str] = set()
+        # (encoded id, offset, nbytes, nrows, codec id)
+        self._entries: List[Tuple[bytes, int, int, int, int]] = []
+
+        directory = os.path.dirname(shard_file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(shard_file_path, "wb")
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION, 0, 0, 0, 0))
+
+    def add(self, patient_id: str, boxes: Union[Sequence[str], np.ndarray]) -> None:
+        """
+        Appends one patient's boxes to the shard.
+
+        Args:
+            patient_id (str): Unique patient identifier
+            boxes (Union[Sequence[str], np.ndarray]): YOLO lines (e.g. ``Converter.yolo_content``)
+                                                      or an (n, 7) array
+
+        Raises:
+            ValueError: If the patient ID is duplicated or the boxes are malformed
+        """
+        if self._file is None:
+            raise ValueError("Cannot add to a closed shard")
+        if patient_id in self._patient_ids:
+            raise ValueError(f"Duplicate patient ID in shard: {patient_id}")
+
+        if isinstance(boxes, np.ndarray):
+            records = boxes
+        else:
+            records = parse_yolo_lines(boxes)
+        records = np.ascontiguousarray(records, dtype=_RECORD_DTYPE)
+        if records.ndim != 2 or records.shape[1] != _RECORD_WIDTH:
+            raise ValueError(f"Expected boxes of shape (n, {_RECORD_WIDTH}), got {records.shape}")
+
+        payload = records.tobytes()
+        codec = CODEC_NONE
+        if self.compression == CODEC_ZSTD:
+            payload = self._compressor.compress(payload)
+            codec = CODEC_ZSTD
+
+        # Keep raw blocks aligned so they can be viewed in place
+        self._pad(_ALIGNMENT)
+
+        offset = self._file.tell()
+        self._file.write(payload)
+        self._patient_ids.add(patient_id)
+        self._entries.append((patient_id.encode("utf-8"), offset, len(payload), int(records.shape[0]), _CODEC_IDS[codec]))
+
+    def _pad(self, alignment: int) -> None:
+        padding = -self._file.tell() % alignment
+        if padding:
+            self._file.write(b"\0" * padding)
+
+    def close(self) -> None:
+        """
+        Writes the index and header, then closes the shard file.
+        """
+        if self._file is None:
+            return
+
+        index = np.zeros(len(self._entries), dtype=_INDEX_DTYPE)
+        id_table = bytearray()
+        for position, (encoded_id, offset, nbytes, nrows, codec) in enumerate(self._entries):
+            index[position] = (_hash_id(encoded_id), len(id_table), offset, nbytes, nrows, len(encoded_id), codec)
+            id_table += encoded_id
+        index = index[np.argsort(index["id_hash"], kind="stable")]
+
+        self._pad(_INDEX_ALIGNMENT)
+        index_offset = self._file.tell()
+        self._file.write(index.tobytes())
+        self._file.write(bytes(id_table))
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION, 0, index_offset, len(index), len(id_table)))
+        self._file.close()
+        self._file = None
+
+    def abort(self) -> None:
+        """
+        Closes the shard file without writing the index, leaving it unreadable.
+        """
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+class ShardReader:
+    """
+    Reads patient labels from a shard written by ``ShardWriter``.
+
+    The shard, including its index, is memory-mapped once. Opening a shard
+    does not parse the index, and looking up a patient bisects the mapped
+    index by ID hash, then returns a zero-copy view of the block (or a
+    single zstd decompression for compressed blocks).
+
+    Attributes:
+        shard_file_path (str): Path of the shard being read
+    """
+
+    def __init__(self, shard_file_path: str):
+        """
+        Open a shard for reading.
+
+        Args:
+            shard_file_path (str): Path to the shard file
+
+        Raises:
+            FileNotFoundError: If the shard file doesn't exist
+            ValueError: If the file is not a valid shard
+        """
+        if not os.path.exists(shard_file_path):
+            raise FileNotFoundError(f"Shard file not found: {shard_file_path}")
+
+        self.shard_file_path = shard_file_path
+        self._mmap = None
+        self._file = open(shard_file_path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            self._file = None
+            raise ValueError(f"Invalid shard file (empty): {shard_file_path}")
+
+        try:
+            if len(self._mmap) < _HEADER.size:
+                raise ValueError(f"Invalid shard file (truncated header): {shard_file_path}")
+            magic, version, _, index_offset, entry_count, id_table_length = _HEADER.unpack_from(self._mmap, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"Invalid shard file (bad magic): {shard_file_path}")
+            if version != _VERSION:
+                raise ValueError(f"Unsupported shard version {version} in {shard_file_path}")
+            self._id_table_offset = index_offset + entry_count * _INDEX_DTYPE.itemsize
+            if index_offset == 0 or self._id_table_offset + id_table_length > len(self._mmap):
+                raise ValueError(f"Invalid shard file (missing index, was the writer closed?): {shard_file_path}")
+            self._index = np.frombuffer(self._mmap, dtype=_INDEX_DTYPE, count=entry_count, offset=index_offset)
+        except Exception:
+            self.close()
+            raise
+
+        self._decompressor = None
+
+    def _patient_id(self, entry: np.void) -> str:
+        start = self._id_table_offset + int(entry["id_offset"])
+        return self._mmap[start:start + int(entry["id_length"])].decode("utf-8")
+
+    def _find(self, patient_id: str) -> Optional[np.void]:
+        """
+        Returns the index entry of a patient, or None if it is not in the shard.
+        """
+        encoded_id = patient_id.encode("utf-8")
+        id_hash = np.uint64(_hash_id(encoded_id))
+        position = int(np.searchsorted(self._index["id_hash"], id_hash, side="left"))
+        while position < len(self._index) and self._index[position]["id_hash"] == id_hash:
+            entry = self._index[position]
+            start = self._id_table_offset + int(entry["id_offset"])
+            if self._mmap[start:start + int(entry["id_length"])] == encoded_id:
+                return entry
+            position += 1
+        return None
+
+    def get(self, patient_id: str) -> np.ndarray:
+        """
+        Returns a patient's boxes.
+
+        Args:
+            patient_id (str): Patient identifier
+
+        Returns:
+            np.ndarray: Read-only float32 array of shape (n, 7)
+
+        Raises:
+            KeyError: If the patient is not in the shard
+        """
+        entry = self._find(patient_id)
+        if entry is None:
+            raise KeyError(f"Patient not found in shard: {patient_id}")
+        offset, nbytes, nrows = int(entry["offset"]), int(entry["nbytes"]), int(entry["nrows"])
+
+        if int(entry["codec"]) == _CODEC_IDS[CODEC_ZSTD]:
+            if self._decompressor is None:
+                _require_zstandard()
+                self._decompressor = zstandard.ZstdDecompressor()
+            payload = self._decompressor.decompress(
+                self._mmap[offset:offset + nbytes],
+                max_output_size=nrows * _RECORD_WIDTH * _RECORD_DTYPE.itemsize
+            )
+            records = np.frombuffer(payload, dtype=_RECORD_DTYPE)
+        else:
+            records = np.frombuffer(self._mmap, dtype=_RECORD_DTYPE, count=nrows * _RECORD_WIDTH, offset=offset)
+
+        return records.reshape(nrows, _RECORD_WIDTH)
+
+    def keys(self) -> List[str]:
+        """
+        Returns the patient IDs stored in the shard (in index order).
+        """
+        return [self._patient_id(entry) for entry in self._index]
+
+    def close(self) -> None:
+        """
+        Releases the memory map and file handle.
+        """
+        self._index = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Arrays returned by get() still reference the mapping; it is
+                # released once they are garbage collected.
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __getitem__(self, patient_id: str) -> np.ndarray:
+        return self.get(patient_id)
+
+    def __contains__(self, patient_id: object) -> bool:
+        return isinstance(patient_id, str) and self._find(patient_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __enter__(self) -> "ShardReader":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,182 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+from .utils import parse_roi_data
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rois (
+    digest TEXT PRIMARY KEY,
+    center_x REAL NOT NULL, center_y REAL NOT NULL, center_z REAL NOT NULL,
+    size_x REAL NOT NULL, size_y REAL NOT NULL, size_z REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+"""
+
+
+class AnnotationStore:
+    """
+    Content-addressed store of parsed 3D Slicer ROI JSON files.
+
+    Each JSON file is identified by the SHA-256 digest of its bytes, and its
+    parsed ROI (center and size) is stored once per digest in a local SQLite
+    database. Identical files in different labeling rounds therefore share a
+    single entry and are only parsed the first time they are seen. A second
+    table remembers the digest of each path (keyed by mtime and size) so
+    unchanged files are not even re-hashed.
+
+    New rows are staged in memory and written in a single transaction by
+    flush() (also called by close()), so callers commit once per patient or
+    batch instead of once per file. Staged rows are visible to load_roi
+    before they are flushed.
+
+    Attributes:
+        db_path (str): Path to the SQLite database
+        parsed_count (int): Number of files parsed by this instance
+        reused_count (int): Number of files resolved from stored content
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Open (or create) an annotation store.
+
+        Args:
+            db_path (str): Path to the SQLite database file, or ":memory:"
+        """
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self.parsed_count = 0
+        self.reused_count = 0
+        self._lock = threading.Lock()
+        # Rows staged for the next flush(): digest -> (center, size) and path -> (mtime_ns, size, digest)
+        self._pending_rois: Dict[str, Tuple[List[float], List[float]]] = {}
+        self._pending_files: Dict[str, Tuple[int, int, str]] = {}
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        self._connection.commit()
+
+    def load_roi(self, json_file_path: str) -> Tuple[List[float], List[float]]:
+        """
+        Returns the ROI center and size of a Slicer JSON file, parsing it only if its content is new.
+
+        Args:
+            json_file_path (str): Path to the ROI JSON file
+
+        Returns:
+            Tuple[List[float], List[float]]: ROI center (patient coordinates) and size in mm
+
+        Raises:
+            FileNotFoundError: If JSON file doesn't exist
+            ValueError: If the file is not valid JSON or the ROI is not 3D
+            KeyError: If JSON structure is invalid
+        """
+        if not os.path.exists(json_file_path):
+            raise FileNotFoundError(f"JSON file not found: {json_file_path}")
+
+        path = os.path.abspath(json_file_path)
+        stat = os.stat(path)
+
+        with self._lock:
+            pending_file = self._pending_files.get(path)
+            if pending_file is not None and pending_file[:2] == (stat.st_mtime_ns, stat.st_size):
+                self.reused_count += 1
+                return self._pending_rois.get(pending_file[2]) or self._select_roi(pending_file[2])
+            row = self._connection.execute(
+                "SELECT r.center_x, r.center_y, r.center_z, r.size_x, r.size_y, r.size_z "
+                "FROM files f JOIN rois r ON r.digest = f.digest "
+                "WHERE f.path = ? AND f.mtime_ns = ? AND f.size = ?",
+                (path, stat.st_mtime_ns, stat.st_size)
+            ).fetchone()
+            if row is not None:
+                self.reused_count += 1
+                return list(row[:3]), list(row[3:])
+
+        with open(path, 'rb') as file:
+            content = file.read()
+        digest = hashlib.sha256(content).hexdigest()
+
+        with self._lock:
+            roi = self._pending_rois.get(digest) or self._select_roi(digest)
+
+        if roi is not None:
+            center, roi_size_mm = roi
+            reused = True
+        else:
+            try:
+                data = json.loads(content.decode('utf-8'))
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                raise ValueError(f"Invalid JSON format in {json_file_path}: {str(e)}")
+            center, roi_size_mm = parse_roi_data(data, json_file_path)
+            reused = False
+
+        with self._lock:
+            if not reused:
+                self._pending_rois[digest] = (center, roi_size_mm)
+            self._pending_files[path] = (stat.st_mtime_ns, stat.st_size, digest)
+            if reused:
+                self.reused_count += 1
+            else:
+                self.parsed_count += 1
+
+        return center, roi_size_mm
+
+    def _select_roi(self, digest: str) -> Optional[Tuple[List[float], List[float]]]:
+        """
+        Returns the stored ROI for a digest, or None. Must be called with the lock held.
+        """
+        row = self._connection.execute(
+            "SELECT center_x, center_y, center_z, size_x, size_y, size_z FROM rois WHERE digest = ?",
+            (digest,)
+        ).fetchone()
+        return (list(row[:3]), list(row[3:])) if row is not None else None
+
+    def flush(self) -> None:
+        """
+        Writes all staged rows to the database in a single transaction.
+        """
+        with self._lock:
+            if not self._pending_rois and not self._pending_files:
+                return
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO rois VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(digest, *center, *roi_size_mm) for digest, (center, roi_size_mm) in self._pending_rois.items()]
+                )
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                    [(path, mtime_ns, size, digest) for path, (mtime_ns, size, digest) in self._pending_files.items()]
+                )
+            self._pending_rois.clear()
+            self._pending_files.clear()
+
+    def __len__(self) -> int:
+        """
+        Returns the number of distinct ROI contents in the store, including staged ones.
+        """
+        with self._lock:
+            stored = self._connection.execute("SELECT COUNT(*) FROM rois").fetchone()[0]
+            staged = sum(1 for digest in self._pending_rois if self._select_roi(digest) is None)
+            return stored + staged
+
+    def close(self) -> None:
+        """
+        Flushes staged rows and closes the database connection.
+        """
+        self.flush()
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> "AnnotationStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -1,6 +1,8 @@
 import os
 import re
-from typing import Dict, List, Tuple, Any
+import json
+from typing import Dict, List, Tuple, Any, Sequence
+import numpy as np
 import nibabel as nib
 
 def load_medical_image(image_file_path: str) -> Tuple[Any, Dict[str, Any]]:
@@ -45,6 +47,178 @@ def load_medical_image(image_file_path: str) -> Tuple[Any, Dict[str, Any]]:
 
     return img_data, metadata
 
+def load_image_metadata(image_file_path: str) -> Dict[str, Any]:
+    """
+    Load only the header metadata of a NIfTI image, without reading voxel data.
+
+    Args:
+        image_file_path (str): Path to the image file (.nii or .nii.gz)
+
+    Returns:
+        Dict[str, Any]: Metadata dictionary with 'resolution', 'shape', and 'affine' keys
+    
+    Raises:
+        FileNotFoundError: If the image file doesn't exist
+        RuntimeError: If the image header cannot be read
+    """
+    if not os.path.exists(image_file_path):
+        raise FileNotFoundError(f"Image file not found: {image_file_path}")
+    
+    if not (image_file_path.endswith('.nii') or image_file_path.endswith('.nii.gz')):
+        raise ValueError(f"Unsupported file format. Expected .nii or .nii.gz, got: {image_file_path}")
+
+    try:
+        img = nib.load(image_file_path)
+        if len(img.shape) != 3:
+            raise ValueError(f"Expected 3D image data, got {len(img.shape)}D")
+        return {
+            "resolution": img.header.get_zooms(),
+            "shape": img.shape,
+            "affine": img.affine
+        }
+    except Exception as e:
+        raise RuntimeError(f"Error loading image header {image_file_path}: {str(e)}")
+
+def compute_image_geometry(metadata: Dict[str, Any]) -> Tuple[np.ndarray, List[float]]:
+    """
+    Computes the image origin and physical size used for coordinate conversion.
+
+    Args:
+        metadata (Dict[str, Any]): Metadata with 'resolution', 'shape', and 'affine' keys
+
+    Returns:
+        Tuple[np.ndarray, List[float]]: Tuple containing:
+            - image top-left origin in the flipped (image) axis convention
+            - physical image size in mm along each axis
+    
+    Raises:
+        ValueError: If resolution, shape or affine are missing
+    """
+    resolution = metadata.get("resolution", None)
+    shape = metadata.get("shape", None)
+    affine = metadata.get("affine", None)
+
+    if not (resolution and shape):
+        raise ValueError("Could not extract image resolution and shape from the medical image")
+    if affine is None:
+        raise ValueError("Could not extract affine transformation from the medical image")
+
+    physical_size_mm = [shape[i] * resolution[i] for i in range(len(shape))]
+    topleft = np.array(affine[:3, 3], copy=True)  # Extract origin (copy to keep the affine intact)
+    topleft[1] *= -1  # Flip Y-axis
+    topleft[2] *= -1  # Flip Z-axis
+    return topleft, physical_size_mm
+
+def read_roi_json(json_file_path: str) -> Tuple[List[float], List[float]]:
+    """
+    Reads the ROI center and size from a 3D Slicer markups JSON file.
+
+    Args:
+        json_file_path (str): Path to the ROI JSON file
+
+    Returns:
+        Tuple[List[float], List[float]]: ROI center (patient coordinates) and size in mm
+    
+    Raises:
+        ValueError: If the file is not valid JSON or the ROI is not 3D
+        KeyError: If JSON structure is invalid
+    """
+    try:
+        with open(json_file_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON format in {json_file_path}: {str(e)}")
+
+    return parse_roi_data(data, json_file_path)
+
+def parse_roi_data(data: Dict[str, Any], source: str = "<data>") -> Tuple[List[float], List[float]]:
+    """
+    Extracts the ROI center and size from parsed 3D Slicer markups JSON.
+
+    Args:
+        data (Dict[str, Any]): Parsed markups JSON
+        source (str): Name used in error messages
+
+    Returns:
+        Tuple[List[float], List[float]]: ROI center (patient coordinates) and size in mm
+    
+    Raises:
+        ValueError: If the ROI is not 3D
+        KeyError: If JSON structure is invalid
+    """
+    try:
+        roi = data['markups'][0]
+        center = roi['center']
+        roi_size_mm = roi['size']
+    except (KeyError, IndexError, TypeError) as e:
+        raise KeyError(f"Invalid ROI JSON structure in {source}: {str(e)}")
+    
+    if len(center) != 3 or len(roi_size_mm) != 3:
+        raise ValueError(f"Invalid ROI dimensions in {source}. Expected 3D coordinates.")
+
+    return [float(v) for v in center], [float(v) for v in roi_size_mm]
+
+def roi_to_yolo_line(class_index: int, center: Sequence[float], roi_size_mm: Sequence[float],
+                     topleft: Sequence[float], physical_size_mm: Sequence[float]) -> str:
+    """
+    Converts an ROI in patient coordinates to a YOLO 3D line.
+
+    Args:
+        class_index (int): Class index of the ROI
+        center (Sequence[float]): ROI center in patient coordinates
+        roi_size_mm (Sequence[float]): ROI size in mm
+        topleft (Sequence[float]): Image origin from compute_image_geometry
+        physical_size_mm (Sequence[float]): Physical image size from compute_image_geometry
+
+    Returns:
+        str: YOLO line ("class center_z center_x center_y width height depth")
+    """
+    # Correct axis directions
+    center = [-1 * center[0], center[1], -1 * center[2]]
+    new_center = [topleft[i] - center[i] for i in range(3)]
+
+    # Normalize coordinates
+    yolo_center = [new_center[i] / physical_size_mm[i] for i in range(3)]
+    yolo_size = [roi_size_mm[i] / physical_size_mm[i] for i in range(3)]
+
+    return f"{class_index} {yolo_center[2]} {yolo_center[0]} {yolo_center[1]} {yolo_size[2]} {yolo_size[0]} {yolo_size[1]}"
+
+def yolo_line_to_roi(line: str, topleft: Sequence[float],
+                     physical_size_mm: Sequence[float]) -> Tuple[int, List[float], List[float]]:
+    """
+    Converts a YOLO 3D line back to an ROI in patient coordinates (inverse of roi_to_yolo_line).
+
+    Args:
+        line (str): YOLO line ("class center_z center_x center_y width height depth")
+        topleft (Sequence[float]): Image origin from compute_image_geometry
+        physical_size_mm (Sequence[float]): Physical image size from compute_image_geometry
+
+    Returns:
+        Tuple[int, List[float], List[float]]: Class index, ROI center in patient coordinates, ROI size in mm
+    
+    Raises:
+        ValueError: If the line is malformed
+    """
+    values = line.split()
+    if len(values) != 7:
+        raise ValueError(f"Expected 7 values per YOLO line, got {len(values)}: {line}")
+    try:
+        class_value, cz, cx, cy, sz, sx, sy = (float(v) for v in values)
+    except ValueError:
+        raise ValueError(f"Invalid numeric value in YOLO line: {line}")
+    class_index = int(class_value)
+
+    yolo_center = [cx, cy, cz]
+    yolo_size = [sx, sy, sz]
+    new_center = [yolo_center[i] * physical_size_mm[i] for i in range(3)]
+    center = [float(topleft[i]) - new_center[i] for i in range(3)]
+
+    # Restore patient axis directions
+    center[0] = -1 * center[0]
+    center[2] = -1 * center[2]
+    roi_size_mm = [float(yolo_size[i] * physical_size_mm[i]) for i in range(3)]
+    return class_index, [float(v) for v in center], roi_size_mm
+
 def get_json_files(folder_path: str) -> List[str]:
     """
     Returns a list of JSON files in a given folder.
@@ -110,12 +284,13 @@ def extract_class_name(filename: str) -> str:
 
     return organ_name
 
-def generate_class_mapping(json_files: List[str]) -> Dict[str, int]:
+def generate_class_mapping(json_files: List[str], verbose: bool = True) -> Dict[str, int]:
     """
     Generates a mapping of unique class names to a unique number starting from 0.
 
     Args:
         json_files (List[str]): List of JSON file paths
+        verbose (bool): If True, print the generated mapping and skipped files
 
     Returns:
         Dict[str, int]: Mapping of class names to unique IDs (starting from 0)
@@ -134,7 +309,8 @@ def generate_class_mapping(json_files: List[str]) -> Dict[str, int]:
             organ_name = extract_class_name(filename)
             unique_labels.add(organ_name)
         except ValueError as e:
-            print(f"Warning: Skipping file {filepath}: {str(e)}")
+            if verbose:
+                print(f"Warning: Skipping file {filepath}: {str(e)}")
             continue
     
     if not unique_labels:
@@ -143,7 +319,8 @@ def generate_class_mapping(json_files: List[str]) -> Dict[str, int]:
     # Assign unique numbers starting from 0 (YOLO convention)
     class_mapping = {label: i for i, label in enumerate(sorted(unique_labels))}
     
-    print(f"Generated class mapping: {class_mapping}")
+    if verbose:
+        print(f"Generated class mapping: {class_mapping}")
     return class_mapping
 
 def get_class_index(class_label: str, class_mapping: Dict[str, int]) -> int:
@@ -167,3 +344,78 @@ def get_class_index(class_label: str, class_mapping: Dict[str, int]) -> int:
         raise ValueError("Class mapping must be a dictionary")
     
     return class_mapping.get(class_label, -1)  # Return -1 if class not found
+
+def validate_class_mapping(class_mapping: Any, source: str = "class mapping") -> Dict[str, int]:
+    """
+    Checks that a class mapping maps class names to non-negative integer class IDs.
+
+    Args:
+        class_mapping (Any): Candidate mapping, e.g. decoded from JSON
+        source (str): Description of where the mapping came from, used in error messages
+
+    Returns:
+        Dict[str, int]: The same mapping
+
+    Raises:
+        ValueError: If the mapping is not a non-empty dict of str to non-negative int
+    """
+    if not isinstance(class_mapping, dict) or not class_mapping:
+        raise ValueError(f"Invalid {source}: expected a non-empty object of class name -> class ID")
+    for name, index in class_mapping.items():
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"Invalid {source}: class names must be non-empty strings, got {name!r}")
+        if isinstance(index, bool) or not isinstance(index, int) or index < 0:
+            raise ValueError(f"Invalid {source}: class ID of {name!r} must be a non-negative integer, got {index!r}")
+    return class_mapping
+
+def load_class_mapping(json_file_path: str) -> Dict[str, int]:
+    """
+    Loads a class mapping from a JSON file such as {"liver": 0, "kidney": 1}.
+
+    Args:
+        json_file_path (str): Path to the JSON file
+
+    Returns:
+        Dict[str, int]: Mapping of class names to class IDs
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+        ValueError: If the file is not valid JSON or not a valid class mapping
+    """
+    if not os.path.exists(json_file_path):
+        raise FileNotFoundError(f"Class mapping file not found: {json_file_path}")
+    try:
+        with open(json_file_path, 'r', encoding='utf-8') as file:
+            class_mapping = json.load(file)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid JSON format in {json_file_path}: {str(e)}")
+    return validate_class_mapping(class_mapping, f"class mapping in {json_file_path}")
+
+def parse_yolo_lines(lines: Sequence[str], dtype: Any = np.float32) -> np.ndarray:
+    """
+    Parses YOLO 3D annotation lines into a numeric array.
+
+    Args:
+        lines (Sequence[str]): YOLO lines ("class center_z center_x center_y width height depth")
+        dtype (Any): dtype of the returned array
+
+    Returns:
+        np.ndarray: Array of shape (n, 7), one row per bounding box
+    
+    Raises:
+        ValueError: If a line does not contain exactly 7 numeric values
+    """
+    rows = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        values = line.split()
+        if len(values) != 7:
+            raise ValueError(f"Expected 7 values per YOLO line, got {len(values)}: {line}")
+        try:
+            rows.append([float(v) for v in values])
+        except ValueError:
+            raise ValueError(f"Invalid numeric value in YOLO line: {line}")
+
+    return np.array(rows, dtype=dtype).reshape(-1, 7)
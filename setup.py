@@ -16,7 +16,10 @@ setup(
     python_requires=">=3.7",
     entry_points={
         "console_scripts": [
-            "roi2bb=roi2bb.converter:main"
+            "roi2bb=roi2bb.converter:main",
+            "roi2bb-serve=roi2bb.service:main",
+            "roi2bb-batch=roi2bb.batch:main",
+            "roi2bb-compare=roi2bb.matching:main"
         ],
     },
 )
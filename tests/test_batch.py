@@ -0,0 +1,148 @@
+"""
+Unit tests for the roi2bb batch module.
+"""
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+import nibabel as nib
+
+from roi2bb.batch import BatchConverter, main
+from roi2bb.converter import Converter
+
+
+class TestBatchConverter(unittest.TestCase):
+    """Test cases for the BatchConverter class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.test_dir = tempfile.mkdtemp()
+        self.images_dir = os.path.join(self.test_dir, "images")
+        self.labels_dir = os.path.join(self.test_dir, "labels")
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.checkpoint_path = os.path.join(self.test_dir, "checkpoint.txt")
+        os.makedirs(self.images_dir)
+        os.makedirs(self.labels_dir)
+
+        affine = np.array([[-0.8, 0, 0, 120.0], [0, -0.8, 0, 95.0], [0, 0, 2.5, -210.0], [0, 0, 0, 1]])
+        self.patient_ids = [f"Patient_{index:03d}" for index in range(1, 7)]
+        for index, patient_id in enumerate(self.patient_ids):
+            nib.save(nib.Nifti1Image(np.zeros((32, 24, 16), dtype=np.int16), affine),
+                     os.path.join(self.images_dir, patient_id + ".nii.gz"))
+            json_dir = os.path.join(self.labels_dir, patient_id)
+            os.makedirs(json_dir)
+            for name, offset in (("liver", 0.0), ("lymph_node_1", 5.0), ("lymph_node_2", -3.5)):
+                roi_data = {"markups": [{"center": [index + offset, 2.0 * index, -180.0 + offset], "size": [5.0, 8.0, 6.0]}]}
+                with open(os.path.join(json_dir, f"{patient_id}_{name}.json"), 'w') as f:
+                    json.dump(roi_data, f)
+
+        # A patient without an image
+        os.makedirs(os.path.join(self.labels_dir, "Patient_999"))
+        with open(os.path.join(self.labels_dir, "Patient_999", "liver.json"), 'w') as f:
+            json.dump({"markups": [{"center": [0, 0, 0], "size": [1, 1, 1]}]}, f)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.test_dir)
+
+    def test_run_matches_converter(self):
+        """Test that batch output files are identical to Converter output."""
+        batch = BatchConverter(self.images_dir, self.labels_dir, self.output_dir, max_workers=2, queue_size=1)
+        summary = batch.run()
+
+        self.assertEqual(summary, {"converted": 6, "failed": 1})
+        for patient_id in self.patient_ids:
+            converter = Converter(os.path.join(self.images_dir, patient_id + ".nii.gz"),
+                                  os.path.join(self.labels_dir, patient_id),
+                                  os.path.join(self.test_dir, "expected", patient_id + ".txt"))
+            converter.run()
+            with open(converter.output_file_path, 'r') as expected, \
+                    open(os.path.join(self.output_dir, patient_id + ".txt"), 'r') as actual:
+                self.assertEqual(actual.read(), expected.read())
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "Patient_999.txt")))
+
+    def test_resume_from_checkpoint(self):
+        """Test that an interrupted run resumes without redoing completed patients."""
+        batch = BatchConverter(self.images_dir, self.labels_dir, self.output_dir,
+                               checkpoint_path=self.checkpoint_path, max_workers=2, queue_size=1)
+
+        results = batch.results()
+        first = [next(results) for _ in range(2)]
+        results.close()
+        completed = {result["patient_id"] for result in first if result["error"] is None}
+        self.assertEqual(batch.load_checkpoint(), completed)
+
+        resumed = list(batch.results())
+        resumed_ids = [result["patient_id"] for result in resumed]
+        self.assertFalse(completed & set(resumed_ids))
+        self.assertEqual(batch.load_checkpoint(), set(self.patient_ids))
+
+        # Failed patients are retried, completed ones are skipped
+        self.assertEqual([result["patient_id"] for result in batch.results()], ["Patient_999"])
+
+    def test_partial_checkpoint_line(self):
+        """Test that a checkpoint line cut short by a crash is ignored and not appended to."""
+        with open(self.checkpoint_path, 'w') as f:
+            f.write("Patient_001\nPatient_00")
+        batch = BatchConverter(self.images_dir, self.labels_dir, self.output_dir, checkpoint_path=self.checkpoint_path)
+
+        self.assertEqual(batch.load_checkpoint(), {"Patient_001"})
+        resumed = [result["patient_id"] for result in batch.results()]
+
+        self.assertNotIn("Patient_001", resumed)
+        self.assertEqual(batch.load_checkpoint(), set(self.patient_ids))
+        with open(self.checkpoint_path, 'r') as f:
+            self.assertEqual(sorted(f.read().splitlines()), self.patient_ids)
+
+    def test_class_mapping_shared(self):
+        """Test using one class mapping for the whole cohort."""
+        batch = BatchConverter(self.images_dir, self.labels_dir, self.output_dir,
+                               class_mapping={"lymph node": 7, "liver": 3})
+        results = {result["patient_id"]: result for result in batch.results()}
+
+        self.assertEqual(results["Patient_001"]["boxes"], 3)
+        with open(results["Patient_001"]["output_file"], 'r') as f:
+            classes = [line.split()[0] for line in f.read().splitlines()]
+        self.assertEqual(classes, ["3", "7", "7"])
+
+    def test_workers_do_not_print(self):
+        """Test that per-patient class mappings are generated without printing from worker threads."""
+        batch = BatchConverter(self.images_dir, self.labels_dir, self.output_dir, max_workers=2)
+        with patch('builtins.print') as mock_print:
+            results = list(batch.results())
+
+        self.assertEqual(len(results), 7)
+        mock_print.assert_not_called()
+
+    def test_cli_requires_class_mapping(self):
+        """Test that the CLI writes every patient with the mapping file, and refuses to run without one."""
+        # A patient with fewer classes would get different IDs from a per-patient mapping
+        os.remove(os.path.join(self.labels_dir, "Patient_002", "Patient_002_liver.json"))
+        mapping_path = os.path.join(self.test_dir, "classes.json")
+        with open(mapping_path, 'w') as f:
+            json.dump({"liver": 0, "lymph node": 1}, f)
+
+        argv = ["roi2bb-batch", self.images_dir, self.labels_dir, self.output_dir]
+        with patch('sys.argv', argv), patch('builtins.print'), self.assertRaises(SystemExit):
+            main()
+        self.assertFalse(os.path.exists(self.output_dir))
+
+        with patch('sys.argv', argv + ["--class-mapping", mapping_path]), patch('builtins.print'):
+            main()
+        for patient_id, expected in (("Patient_001", ["0", "1", "1"]), ("Patient_002", ["1", "1"])):
+            with open(os.path.join(self.output_dir, patient_id + ".txt"), 'r') as f:
+                self.assertEqual([line.split()[0] for line in f.read().splitlines()], expected)
+
+    def test_invalid_inputs(self):
+        """Test BatchConverter initialization with invalid arguments."""
+        with self.assertRaises(FileNotFoundError):
+            BatchConverter("nonexistent_dir", self.labels_dir, self.output_dir)
+        with self.assertRaises(ValueError):
+            BatchConverter(self.images_dir, self.labels_dir, self.output_dir, max_workers=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -175,6 +175,49 @@ class TestConverter(unittest.TestCase):
         converter = Converter(self.image_path, self.json_dir, self.output_path, class_mapping=custom_mapping)
         
         self.assertEqual(converter.class_mapping, custom_mapping)
+    
+    @patch('roi2bb.converter.load_medical_image')
+    def test_process_all_rois_threaded(self, mock_load_image):
+        """Test that threaded processing matches sequential output and collects warnings."""
+        # Mock the image loading
+        mock_load_image.return_value = (
+            np.zeros((100, 100, 100)),
+            {
+                "resolution": (1.0, 1.0, 1.0),
+                "shape": (100, 100, 100),
+                "affine": np.array([[1, 0, 0, 50], [0, -1, 0, 50], [0, 0, -1, 50], [0, 0, 0, 1]])
+            }
+        )
+        
+        # Create additional JSON files, including an invalid one
+        for index in range(20):
+            roi_data = {"markups": [{"center": [index, 2.0 * index, 3.0], "size": [5.0, 8.0, index + 1.0]}]}
+            with open(os.path.join(self.json_dir, f"Patient_001_kidney_{index}.json"), 'w') as f:
+                json.dump(roi_data, f)
+        with open(os.path.join(self.json_dir, "Patient_001_trachea.json"), 'w') as f:
+            f.write("{not valid json")
+        
+        # Create a dummy image file
+        with open(self.image_path, 'w') as f:
+            f.write("dummy")
+        
+        sequential = Converter(self.image_path, self.json_dir, self.output_path)
+        sequential.process_all_rois()
+        threaded = Converter(self.image_path, self.json_dir, self.output_path, max_workers=4)
+        threaded.process_all_rois()
+        
+        self.assertEqual(len(threaded.yolo_content), 21)
+        self.assertEqual(threaded.yolo_content, sequential.yolo_content)
+        self.assertEqual(len(threaded.warnings), 1)
+        self.assertIn("Patient_001_trachea.json", threaded.warnings[0])
+    
+    def test_init_invalid_max_workers(self):
+        """Test Converter initialization with an invalid worker count."""
+        with open(self.image_path, 'w') as f:
+            f.write("dummy")
+        
+        with self.assertRaises(ValueError):
+            Converter(self.image_path, self.json_dir, self.output_path, max_workers=0)
 
 
 if __name__ == '__main__':
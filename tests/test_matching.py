@@ -0,0 +1,131 @@
+"""
+Unit tests for the roi2bb matching module.
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from roi2bb.matching import load_boxes, box_iou_3d, match_boxes, compare_cohort, pair_label_folders
+
+
+class TestMatching(unittest.TestCase):
+    """Test cases for box IoU and matching."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.test_dir = tempfile.mkdtemp()
+        self.ground_truth = [
+            "0 0.5 0.5 0.5 0.2 0.2 0.2",
+            "1 0.2 0.2 0.2 0.1 0.1 0.1",
+            "1 0.8 0.8 0.8 0.1 0.1 0.1"
+        ]
+        self.predictions = [
+            "0 0.5 0.5 0.55 0.2 0.2 0.2",
+            "1 0.2 0.2 0.2 0.1 0.1 0.1",
+            "2 0.8 0.8 0.8 0.1 0.1 0.1"
+        ]
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        shutil.rmtree(self.test_dir)
+
+    def _write(self, folder, patient_id, lines):
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, patient_id + ".txt")
+        with open(path, 'w') as f:
+            f.write("\n".join(lines))
+        return path
+
+    def test_box_iou_3d(self):
+        """Test pairwise IoU values."""
+        boxes_a = load_boxes(["0 0.5 0.5 0.5 0.2 0.2 0.2", "0 0.1 0.1 0.1 0.1 0.1 0.1"])
+        boxes_b = load_boxes(["0 0.5 0.5 0.55 0.2 0.2 0.2", "0 0.5 0.5 0.5 0.2 0.2 0.2"])
+
+        iou = box_iou_3d(boxes_a, boxes_b)
+
+        self.assertEqual(iou.shape, (2, 2))
+        np.testing.assert_allclose(iou[0], [0.15 / 0.25, 1.0])
+        np.testing.assert_allclose(iou[1], [0.0, 0.0])
+
+    def test_match_boxes_class_aware(self):
+        """Test that boxes only match within the same class."""
+        result = match_boxes(self.ground_truth, self.predictions, iou_threshold=0.5)
+
+        self.assertEqual([(gt, pred) for gt, pred, _ in result["matches"]], [(0, 0), (1, 1)])
+        self.assertEqual(result["per_class"][1]["recall"], 0.5)
+        self.assertIsNone(result["per_class"][2]["recall"])
+        self.assertEqual(result["per_class"][2]["precision"], 0.0)
+        self.assertAlmostEqual(result["overall"]["precision"], 2 / 3)
+        self.assertAlmostEqual(result["overall"]["mean_iou"], (0.6 + 1.0) / 2)
+
+    def test_match_boxes_one_to_one(self):
+        """Test that each box is matched at most once, highest IoU first."""
+        ground_truth = ["0 0.5 0.5 0.5 0.2 0.2 0.2"]
+        predictions = ["0 0.5 0.5 0.52 0.2 0.2 0.2", "0 0.5 0.5 0.5 0.2 0.2 0.2"]
+
+        result = match_boxes(ground_truth, predictions, iou_threshold=0.1)
+
+        self.assertEqual([(gt, pred) for gt, pred, _ in result["matches"]], [(0, 1)])
+        self.assertAlmostEqual(result["matches"][0][2], 1.0)
+        self.assertEqual(result["overall"]["precision"], 0.5)
+
+    def test_match_boxes_invalid_threshold(self):
+        """Test matching with an invalid IoU threshold."""
+        with self.assertRaises(ValueError):
+            match_boxes(self.ground_truth, self.predictions, iou_threshold=1.5)
+        with self.assertRaises(ValueError):
+            match_boxes(self.ground_truth, self.predictions, iou_threshold=0.0)
+        with self.assertRaises(ValueError):
+            compare_cohort({"Patient_001": (self.ground_truth, self.predictions)}, iou_threshold=0.0)
+
+    def test_compare_cohort_process_pool(self):
+        """Test cohort comparison on a process pool matches the single-process result."""
+        ground_truth_dir = os.path.join(self.test_dir, "round1")
+        prediction_dir = os.path.join(self.test_dir, "round2")
+        for index in range(4):
+            self._write(ground_truth_dir, f"Patient_{index:03d}", self.ground_truth)
+            self._write(prediction_dir, f"Patient_{index:03d}", self.predictions)
+        self._write(ground_truth_dir, "Patient_999", self.ground_truth)
+
+        pairs = pair_label_folders(ground_truth_dir, prediction_dir)
+        sequential = compare_cohort(pairs)
+        parallel = compare_cohort(pairs, max_workers=2)
+
+        self.assertEqual(parallel, sequential)
+        self.assertEqual(len(parallel["patients"]), 5)
+        self.assertEqual(parallel["patients"]["Patient_999"]["overall"]["recall"], 0.0)
+        self.assertEqual(parallel["per_class"][0]["matched"], 4)
+        self.assertEqual(parallel["overall"]["ground_truth"], 15)
+
+    def test_pair_label_folders_prediction_only_patient(self):
+        """Test that a patient with predictions but no ground truth counts as false positives."""
+        ground_truth_dir = os.path.join(self.test_dir, "ground_truth")
+        prediction_dir = os.path.join(self.test_dir, "predictions")
+        self._write(ground_truth_dir, "Patient_001", self.ground_truth)
+        self._write(prediction_dir, "Patient_001", self.ground_truth)
+        self._write(prediction_dir, "Patient_002", self.predictions)
+
+        pairs = pair_label_folders(ground_truth_dir, prediction_dir)
+        result = compare_cohort(pairs)
+
+        self.assertEqual(sorted(pairs), ["Patient_001", "Patient_002"])
+        self.assertEqual(pairs["Patient_002"][0], [])
+        self.assertEqual(result["patients"]["Patient_002"]["overall"]["precision"], 0.0)
+        self.assertEqual(result["overall"]["predictions"], 6)
+        self.assertEqual(result["overall"]["precision"], 0.5)
+        self.assertEqual(result["overall"]["recall"], 1.0)
+
+    def test_compare_cohort_reports_errors(self):
+        """Test that malformed label files are reported per patient."""
+        bad_path = self._write(self.test_dir, "bad", ["0 0.5 0.5"])
+
+        result = compare_cohort({"bad": (bad_path, self.predictions), "good": (self.ground_truth, self.predictions)})
+
+        self.assertIn("bad", result["errors"])
+        self.assertIn("good", result["patients"])
+
+
+if __name__ == '__main__':
+    unittest.main()
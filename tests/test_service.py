@@ -0,0 +1,310 @@
+"""
+Unit tests for the roi2bb service module.
+"""
+import os
+import json
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+import http.client
+from unittest.mock import patch
+import numpy as np
+import nibabel as nib
+
+from roi2bb import utils
+from roi2bb.converter import Converter
+from roi2bb.service import LRUCache, ConversionService, MAX_BODY_SIZE, make_server, make_unix_server
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test cases for the LRUCache class."""
+
+    def test_eviction_order(self):
+        """Test that the least recently used entry is evicted."""
+        cache = LRUCache(maxsize=2)
+        cache.get_or_compute("a", lambda: 1)
+        cache.get_or_compute("b", lambda: 2)
+        cache.get_or_compute("a", lambda: 0)
+        cache.get_or_compute("c", lambda: 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get_or_compute("a", lambda: 0), 1)
+        self.assertEqual(cache.get_or_compute("b", lambda: 20), 20)
+
+    def test_failures_not_cached(self):
+        """Test that exceptions propagate and are not cached."""
+        cache = LRUCache(maxsize=2)
+
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            cache.get_or_compute("a", fail)
+        self.assertEqual(cache.get_or_compute("a", lambda: 1), 1)
+
+    def test_invalid_size(self):
+        """Test creating a cache with an invalid size."""
+        with self.assertRaises(ValueError):
+            LRUCache(maxsize=0)
+
+
+class TestConversionService(unittest.TestCase):
+    """Test cases for the ConversionService class and its servers."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.test_dir = tempfile.mkdtemp()
+        self.image_path = os.path.join(self.test_dir, "Patient_001.nii.gz")
+        self.json_dir = os.path.join(self.test_dir, "Patient_001")
+        self.output_path = os.path.join(self.test_dir, "output", "Patient_001.txt")
+        os.makedirs(self.json_dir)
+
+        affine = np.array([[-0.8, 0, 0, 120.0], [0, -0.8, 0, 95.0], [0, 0, 2.5, -210.0], [0, 0, 0, 1]])
+        nib.save(nib.Nifti1Image(np.zeros((64, 48, 32), dtype=np.int16), affine), self.image_path)
+
+        self.rois = {
+            "Patient_001_liver.json": {"markups": [{"center": [10.0, 20.0, -150.0], "size": [30.0, 25.0, 40.0]}]},
+            "Patient_001_lymph_node_1.json": {"markups": [{"center": [-5.5, 12.25, -180.0], "size": [8.0, 6.0, 10.0]}]},
+            "Patient_001_lymph_node_2.json": {"markups": [{"center": [3.0, -7.0, -160.5], "size": [5.0, 5.0, 7.5]}]}
+        }
+        for name, data in self.rois.items():
+            with open(os.path.join(self.json_dir, name), 'w') as f:
+                json.dump(data, f)
+
+        self.service = ConversionService(max_workers=2)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        self.service.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_convert_matches_converter(self):
+        """Test that service output is identical to Converter output."""
+        converter = Converter(self.image_path, self.json_dir, self.output_path)
+        converter.process_all_rois()
+
+        response = self.service.convert({"image_file": self.image_path, "json_folder": self.json_dir})
+
+        self.assertEqual(response["lines"], converter.yolo_content)
+        self.assertEqual(response["warnings"], [])
+        self.assertEqual(response["class_mapping"], converter.class_mapping)
+
+    def test_convert_inline_annotations(self):
+        """Test converting ROI JSON documents passed in the request."""
+        from_folder = self.service.convert({"image_file": self.image_path, "json_folder": self.json_dir})
+        inline = self.service.convert({"image_file": self.image_path, "annotations": self.rois})
+
+        self.assertEqual(inline["lines"], from_folder["lines"])
+
+    def test_convert_uses_caches(self):
+        """Test that repeated requests are served from the caches."""
+        request = {"image_file": self.image_path, "json_folder": self.json_dir, "output_file": self.output_path}
+        with patch('roi2bb.service.load_image_metadata', wraps=utils.load_image_metadata) as mock_load:
+            first = self.service.convert(request)
+            second = self.service.convert(request)
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_load.call_count, 1)
+        self.assertEqual(self.service.stats()["roi"]["hits"], 3)
+        with open(self.output_path, 'r') as f:
+            self.assertEqual(f.read(), "\n".join(first["lines"]))
+
+    def test_convert_reports_warnings(self):
+        """Test that invalid ROI files are reported without failing the request."""
+        with open(os.path.join(self.json_dir, "Patient_001_trachea.json"), 'w') as f:
+            f.write("{not valid json")
+
+        response = self.service.convert({"image_file": self.image_path, "json_folder": self.json_dir})
+
+        self.assertEqual(len(response["lines"]), 3)
+        self.assertEqual(len(response["warnings"]), 1)
+
+    def test_reverse_convert_roundtrip(self):
+        """Test that reverse conversion recovers the Slicer ROIs."""
+        response = self.service.convert({"image_file": self.image_path, "json_folder": self.json_dir})
+        reverse = self.service.reverse_convert({
+            "image_file": self.image_path,
+            "lines": response["lines"],
+            "class_mapping": response["class_mapping"]
+        })
+
+        self.assertEqual(len(reverse["rois"]), 3)
+        for roi, name in zip(reverse["rois"], sorted(self.rois)):
+            expected = self.rois[name]["markups"][0]
+            np.testing.assert_allclose(roi["center"], expected["center"], atol=1e-4)
+            np.testing.assert_allclose(roi["size"], expected["size"], atol=1e-4)
+        self.assertEqual(reverse["rois"][0]["class_name"], "liver")
+
+    def test_batch(self):
+        """Test batch requests with a failing sub-request."""
+        response = self.service.handle("batch", {"requests": [
+            {"action": "convert", "image_file": self.image_path, "json_folder": self.json_dir},
+            {"action": "convert", "image_file": "missing.nii.gz", "json_folder": self.json_dir},
+            {"action": "reverse", "image_file": self.image_path, "lines": ["0 0.5 0.5 0.5 0.1 0.1 0.1"]}
+        ]})
+
+        results = response["results"]
+        self.assertEqual(len(results[0]["lines"]), 3)
+        self.assertIn("error", results[1])
+        self.assertEqual(len(results[2]["rois"]), 1)
+
+    def test_root_dir_confines_paths(self):
+        """Test that request paths outside root_dir are rejected before any file access."""
+        outside_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outside_dir)
+        service = ConversionService(root_dir=self.test_dir)
+        self.addCleanup(service.close)
+
+        inside = service.convert({"image_file": self.image_path, "json_folder": self.json_dir,
+                                  "output_file": self.output_path})
+        self.assertEqual(len(inside["lines"]), 3)
+
+        escaped_output = os.path.join(self.test_dir, "..", os.path.basename(outside_dir), "stolen.txt")
+        with self.assertRaises(PermissionError):
+            service.convert({"image_file": self.image_path, "json_folder": self.json_dir,
+                             "output_file": escaped_output})
+        self.assertFalse(os.path.exists(os.path.join(outside_dir, "stolen.txt")))
+
+        secret_path = os.path.join(outside_dir, "secret.txt")
+        with open(secret_path, 'w') as f:
+            f.write("top secret")
+        with self.assertRaises(PermissionError):
+            service.reverse_convert({"image_file": self.image_path, "label_file": secret_path})
+
+    def test_malformed_label_file_not_echoed(self):
+        """Test that malformed label file content is not returned in error messages."""
+        label_path = os.path.join(self.test_dir, "labels.txt")
+        with open(label_path, 'w') as f:
+            f.write("0 0.5 0.5 0.5 0.1 0.1 0.1\npassword=hunter2")
+
+        with self.assertRaises(ValueError) as context:
+            self.service.reverse_convert({"image_file": self.image_path, "label_file": label_path})
+        self.assertIn("line 2", str(context.exception))
+        self.assertNotIn("hunter2", str(context.exception))
+
+    def test_unknown_action(self):
+        """Test dispatching an unknown action."""
+        with self.assertRaises(ValueError):
+            self.service.handle("delete", {})
+
+    def _request(self, connection, method, path, body=None):
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        connection.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read().decode("utf-8"))
+
+    def test_http_server(self):
+        """Test the HTTP front end on a local port."""
+        server = make_server(self.service, port=0, quiet=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+            status, body = self._request(connection, "GET", "/health")
+            self.assertEqual((status, body), (200, {"status": "ok"}))
+
+            status, body = self._request(connection, "POST", "/convert", {"image_file": self.image_path, "json_folder": self.json_dir})
+            self.assertEqual(status, 200)
+            self.assertEqual(len(body["lines"]), 3)
+
+            status, body = self._request(connection, "POST", "/convert", {"json_folder": self.json_dir})
+            self.assertEqual(status, 400)
+            self.assertIn("image_file", body["error"])
+
+            server.service = ConversionService(root_dir=self.json_dir)
+            self.addCleanup(server.service.close)
+            status, body = self._request(connection, "POST", "/convert", {"image_file": self.image_path, "json_folder": self.json_dir})
+            self.assertEqual(status, 403)
+            connection.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_http_rejects_bad_content_length(self):
+        """Test that negative or oversized Content-Length headers are rejected without reading the body."""
+        server = make_server(self.service, port=0, quiet=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            for content_length, expected_status in (("-1", 400), ("abc", 400), (str(MAX_BODY_SIZE + 1), 413)):
+                connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+                connection.putrequest("POST", "/convert")
+                connection.putheader("Content-Length", content_length)
+                connection.endheaders()
+                response = connection.getresponse()
+                self.assertEqual(response.status, expected_status)
+                self.assertIn("error", json.loads(response.read().decode("utf-8")))
+                connection.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_invalid_class_mapping(self):
+        """Test that /convert and /reverse reject class mappings that are not str -> int with a 400."""
+        server = make_server(self.service, port=0, quiet=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+            status, body = self._request(connection, "POST", "/convert", {
+                "image_file": self.image_path,
+                "json_folder": self.json_dir,
+                "class_mapping": {"liver": "x", "lymph node": 1},
+                "output_file": self.output_path
+            })
+            self.assertEqual(status, 400)
+            self.assertIn("class_mapping", body["error"])
+            self.assertFalse(os.path.exists(self.output_path))
+
+            status, body = self._request(connection, "POST", "/reverse", {
+                "image_file": self.image_path,
+                "lines": ["0 0.5 0.5 0.5 0.1 0.1 0.1"],
+                "class_mapping": [1]
+            })
+            self.assertEqual(status, 400)
+            self.assertIn("class_mapping", body["error"])
+            connection.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix sockets not supported")
+    def test_unix_server(self):
+        """Test the HTTP front end on a Unix domain socket."""
+        socket_path = os.path.join(self.test_dir, "roi2bb.sock")
+        server = make_unix_server(self.service, socket_path, quiet=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            connection = http.client.HTTPConnection("localhost", timeout=10)
+            connection.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.sock.connect(socket_path)
+            status, body = self._request(connection, "POST", "/reverse", {
+                "image_file": self.image_path,
+                "lines": ["0 0.5 0.5 0.5 0.1 0.1 0.1"]
+            })
+            self.assertEqual(status, 200)
+            self.assertEqual(len(body["rois"]), 1)
+            connection.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix sockets not supported")
+    def test_unix_server_keeps_regular_file(self):
+        """Test that an existing non-socket file at the socket path is not deleted."""
+        socket_path = os.path.join(self.test_dir, "important.txt")
+        with open(socket_path, 'w') as f:
+            f.write("keep me")
+
+        with self.assertRaises(FileExistsError):
+            make_unix_server(self.service, socket_path, quiet=True)
+        with open(socket_path, 'r') as f:
+            self.assertEqual(f.read(), "keep me")
+
+
+if __name__ == '__main__':
+    unittest.main()
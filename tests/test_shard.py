@@ -0,0 +1,144 @@
+"""
+Unit tests for the roi2bb shard module.
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+from roi2bb.shard import ShardWriter, ShardReader, zstandard
+
+
+class TestShard(unittest.TestCase):
+    """Test cases for ShardWriter and ShardReader."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.test_dir = tempfile.mkdtemp()
+        self.shard_path = os.path.join(self.test_dir, "labels.r2bb")
+        self.patient_lines = {
+            "Patient_001": [
+                "0 0.5 0.25 0.75 0.1 0.2 0.3",
+                "1 0.125 0.5 0.5 0.05 0.05 0.05"
+            ],
+            "Patient_002": ["2 0.5 0.5 0.5 0.25 0.25 0.25"]
+        }
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        shutil.rmtree(self.test_dir)
+
+    def _write_shard(self, compression=None):
+        with ShardWriter(self.shard_path, compression=compression) as writer:
+            for patient_id, lines in self.patient_lines.items():
+                writer.add(patient_id, lines)
+            writer.add("Patient_003", [])
+
+    def test_roundtrip_uncompressed(self):
+        """Test reading back raw float32 blocks."""
+        self._write_shard()
+
+        with ShardReader(self.shard_path) as reader:
+            self.assertEqual(len(reader), 3)
+            self.assertIn("Patient_001", reader)
+            boxes = reader["Patient_001"]
+            self.assertEqual(boxes.shape, (2, 7))
+            self.assertEqual(boxes.dtype, np.float32)
+            np.testing.assert_allclose(boxes[0], [0, 0.5, 0.25, 0.75, 0.1, 0.2, 0.3], rtol=1e-6)
+            self.assertEqual(reader["Patient_003"].shape, (0, 7))
+            del boxes
+
+    @unittest.skipUnless(zstandard is not None, "zstandard not installed")
+    def test_roundtrip_zstd(self):
+        """Test reading back zstd-compressed blocks."""
+        self._write_shard(compression="zstd")
+
+        with ShardReader(self.shard_path) as reader:
+            boxes = reader.get("Patient_002")
+            np.testing.assert_allclose(boxes, [[2, 0.5, 0.5, 0.5, 0.25, 0.25, 0.25]])
+            self.assertEqual(reader.get("Patient_003").shape, (0, 7))
+
+    def test_add_array(self):
+        """Test adding boxes as a NumPy array."""
+        boxes = np.arange(14, dtype=np.float64).reshape(2, 7)
+        with ShardWriter(self.shard_path) as writer:
+            writer.add("Patient_001", boxes)
+
+        with ShardReader(self.shard_path) as reader:
+            np.testing.assert_array_equal(reader["Patient_001"], boxes)
+
+    def test_duplicate_patient(self):
+        """Test that duplicate patient IDs are rejected."""
+        with ShardWriter(self.shard_path) as writer:
+            writer.add("Patient_001", self.patient_lines["Patient_001"])
+            with self.assertRaises(ValueError):
+                writer.add("Patient_001", self.patient_lines["Patient_001"])
+
+    def test_invalid_lines(self):
+        """Test that malformed YOLO lines are rejected."""
+        with ShardWriter(self.shard_path) as writer:
+            with self.assertRaises(ValueError):
+                writer.add("Patient_001", ["0 0.5 0.5"])
+
+    def test_unknown_patient(self):
+        """Test looking up a patient missing from the shard."""
+        self._write_shard()
+        with ShardReader(self.shard_path) as reader:
+            with self.assertRaises(KeyError):
+                reader["Patient_999"]
+
+    def test_invalid_shard(self):
+        """Test opening a file that is not a shard."""
+        bad_path = os.path.join(self.test_dir, "bad.r2bb")
+        with open(bad_path, 'wb') as f:
+            f.write(b"not a shard file at all, just text")
+
+        with self.assertRaises(ValueError):
+            ShardReader(bad_path)
+
+    def test_many_patients_lookup(self):
+        """Test looking up every patient through the binary index."""
+        with ShardWriter(self.shard_path) as writer:
+            for index in range(500):
+                writer.add(f"Patient_{index:04d}", np.full((index % 3, 7), index, dtype=np.float32))
+
+        with ShardReader(self.shard_path) as reader:
+            self.assertEqual(len(reader), 500)
+            self.assertEqual(sorted(reader.keys()), [f"Patient_{index:04d}" for index in range(500)])
+            for index in range(500):
+                boxes = reader[f"Patient_{index:04d}"]
+                self.assertEqual(boxes.shape, (index % 3, 7))
+                self.assertTrue(np.all(boxes == index))
+            self.assertNotIn("Patient_9999", reader)
+            del boxes
+
+    def test_hash_collisions(self):
+        """Test that patients with colliding ID hashes are told apart."""
+        with patch('roi2bb.shard._hash_id', return_value=42):
+            self._write_shard()
+            with ShardReader(self.shard_path) as reader:
+                self.assertEqual(reader["Patient_002"].shape, (1, 7))
+                self.assertEqual(reader["Patient_001"].shape, (2, 7))
+                self.assertNotIn("Patient_004", reader)
+
+    def test_exception_leaves_shard_unreadable(self):
+        """Test that an exception inside the writer block does not produce a valid partial shard."""
+        with self.assertRaises(RuntimeError):
+            with ShardWriter(self.shard_path) as writer:
+                writer.add("Patient_001", self.patient_lines["Patient_001"])
+                raise RuntimeError("conversion failed")
+
+        with self.assertRaises(ValueError) as context:
+            ShardReader(self.shard_path)
+        self.assertIn("missing index", str(context.exception))
+
+    def test_nonexistent_shard(self):
+        """Test opening a nonexistent shard."""
+        with self.assertRaises(FileNotFoundError):
+            ShardReader("nonexistent.r2bb")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+Unit tests for the roi2bb store module.
+"""
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+from roi2bb import utils
+from roi2bb.converter import Converter
+from roi2bb.store import AnnotationStore
+
+
+class TestAnnotationStore(unittest.TestCase):
+    """Test cases for the AnnotationStore class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.test_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.test_dir, "store", "annotations.sqlite")
+        self.round1_dir = os.path.join(self.test_dir, "round1", "Patient_001")
+        os.makedirs(self.round1_dir)
+
+        self.rois = {
+            "liver.json": {"markups": [{"center": [10.0, 20.0, 30.0], "size": [5.0, 8.0, 6.0]}]},
+            "kidney.json": {"markups": [{"center": [-4.5, 2.25, 11.0], "size": [3.0, 3.5, 4.0]}]}
+        }
+        for name, data in self.rois.items():
+            with open(os.path.join(self.round1_dir, name), 'w') as f:
+                json.dump(data, f)
+
+        self.store = AnnotationStore(self.db_path)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_load_roi(self):
+        """Test loading an ROI through the store."""
+        center, size = self.store.load_roi(os.path.join(self.round1_dir, "kidney.json"))
+
+        self.assertEqual(center, [-4.5, 2.25, 11.0])
+        self.assertEqual(size, [3.0, 3.5, 4.0])
+        self.assertEqual(self.store.parsed_count, 1)
+
+    def test_unchanged_round_not_reparsed(self):
+        """Test that identical content in a new round is resolved without parsing."""
+        for name in self.rois:
+            self.store.load_roi(os.path.join(self.round1_dir, name))
+
+        round2_dir = os.path.join(self.test_dir, "round2", "Patient_001")
+        shutil.copytree(self.round1_dir, round2_dir)
+        with open(os.path.join(round2_dir, "liver.json"), 'w') as f:
+            json.dump({"markups": [{"center": [11.0, 20.0, 30.0], "size": [5.0, 8.0, 6.0]}]}, f)
+
+        with patch('roi2bb.store.parse_roi_data', wraps=utils.parse_roi_data) as mock_parse:
+            center, _ = self.store.load_roi(os.path.join(round2_dir, "liver.json"))
+            self.store.load_roi(os.path.join(round2_dir, "kidney.json"))
+
+        self.assertEqual(center, [11.0, 20.0, 30.0])
+        self.assertEqual(mock_parse.call_count, 1)
+        self.assertEqual(len(self.store), 3)
+
+    def _count_commits(self):
+        commits = []
+        self.store._connection.set_trace_callback(
+            lambda statement: commits.append(statement) if statement.strip().upper() == "COMMIT" else None
+        )
+        return commits
+
+    def test_writes_committed_once_per_flush(self):
+        """Test that rows are committed in one transaction and an unchanged round commits nothing."""
+        commits = self._count_commits()
+        for name in self.rois:
+            self.store.load_roi(os.path.join(self.round1_dir, name))
+        self.assertEqual(commits, [])
+        self.store.flush()
+        self.assertEqual(len(commits), 1)
+
+        for name in self.rois:
+            self.store.load_roi(os.path.join(self.round1_dir, name))
+        self.store.flush()
+        self.assertEqual(len(commits), 1)
+        self.assertEqual(self.store.reused_count, 2)
+
+    def test_persistence_and_modification(self):
+        """Test that the store persists across instances and detects edited files."""
+        liver_path = os.path.join(self.round1_dir, "liver.json")
+        self.store.load_roi(liver_path)
+        self.store.close()
+
+        self.store = AnnotationStore(self.db_path)
+        self.store.load_roi(liver_path)
+        self.assertEqual(self.store.reused_count, 1)
+        self.assertEqual(self.store.parsed_count, 0)
+
+        with open(liver_path, 'w') as f:
+            json.dump({"markups": [{"center": [1.0, 2.0, 3.0], "size": [4.0, 5.0, 60.0]}]}, f)
+        center, size = self.store.load_roi(liver_path)
+        self.assertEqual((center, size), ([1.0, 2.0, 3.0], [4.0, 5.0, 60.0]))
+
+    def test_invalid_json(self):
+        """Test that invalid files raise the same errors as direct parsing."""
+        bad_path = os.path.join(self.round1_dir, "bad.json")
+        with open(bad_path, 'w') as f:
+            f.write("{not valid json")
+
+        with self.assertRaises(ValueError):
+            self.store.load_roi(bad_path)
+        with self.assertRaises(FileNotFoundError):
+            self.store.load_roi(os.path.join(self.round1_dir, "missing.json"))
+        self.assertEqual(len(self.store), 0)
+
+    @patch('roi2bb.converter.load_medical_image')
+    def test_converter_with_store(self, mock_load_image):
+        """Test that Converter output is unchanged when using the store."""
+        # Mock the image loading
+        mock_load_image.return_value = (
+            np.zeros((100, 100, 100)),
+            {
+                "resolution": (1.0, 1.0, 1.0),
+                "shape": (100, 100, 100),
+                "affine": np.array([[1, 0, 0, 50], [0, -1, 0, 50], [0, 0, -1, 50], [0, 0, 0, 1]])
+            }
+        )
+        image_path = os.path.join(self.test_dir, "test_image.nii.gz")
+        with open(image_path, 'w') as f:
+            f.write("dummy")
+        output_path = os.path.join(self.test_dir, "output.txt")
+
+        plain = Converter(image_path, self.round1_dir, output_path)
+        plain.process_all_rois()
+        stored = Converter(image_path, self.round1_dir, output_path, max_workers=2, annotation_store=self.store)
+        stored.process_all_rois()
+
+        self.assertEqual(stored.yolo_content, plain.yolo_content)
+        self.assertEqual(self.store.parsed_count, 2)
+
+        # process_all_rois flushes, so a fresh connection sees the rows
+        with AnnotationStore(self.db_path) as reopened:
+            self.assertEqual(len(reopened), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,7 +13,14 @@ from roi2bb.utils import (
     get_json_files,
     extract_class_name,
     generate_class_mapping,
-    get_class_index
+    get_class_index,
+    validate_class_mapping,
+    load_class_mapping,
+    compute_image_geometry,
+    read_roi_json,
+    parse_roi_data,
+    roi_to_yolo_line,
+    yolo_line_to_roi
 )
 
 
@@ -140,6 +147,27 @@ class TestUtils(unittest.TestCase):
         with self.assertRaises(ValueError):
             get_class_index("liver", "not_a_dict")
     
+    def test_validate_class_mapping(self):
+        """Test that class mappings must map names to non-negative integers."""
+        self.assertEqual(validate_class_mapping({"liver": 0, "kidney": 1}), {"liver": 0, "kidney": 1})
+        for invalid in ({"liver": "x"}, {"liver": 1.5}, {"liver": True}, {"liver": -1}, {}, [1], None):
+            with self.assertRaises(ValueError):
+                validate_class_mapping(invalid)
+
+    def test_load_class_mapping(self):
+        """Test loading a class mapping from a JSON file."""
+        mapping_path = os.path.join(self.test_dir, "classes.json")
+        with open(mapping_path, 'w') as f:
+            json.dump({"liver": 0, "kidney": 1}, f)
+        self.assertEqual(load_class_mapping(mapping_path), {"liver": 0, "kidney": 1})
+
+        with open(mapping_path, 'w') as f:
+            f.write("{not valid json")
+        with self.assertRaises(ValueError):
+            load_class_mapping(mapping_path)
+        with self.assertRaises(FileNotFoundError):
+            load_class_mapping(os.path.join(self.test_dir, "missing.json"))
+
     @patch('nibabel.load')
     def test_load_medical_image_success(self, mock_nib_load):
         """Test successful loading of medical image."""
@@ -177,6 +205,93 @@ class TestUtils(unittest.TestCase):
         with self.assertRaises(ValueError):
             load_medical_image(test_file)
 
+    def test_compute_image_geometry(self):
+        """Test computing the image origin and physical size."""
+        affine = np.array([[1.0, 0, 0, 10.0], [0, 1.0, 0, 20.0], [0, 0, 1.0, 30.0], [0, 0, 0, 1]])
+        metadata = {"resolution": (0.5, 1.0, 2.0), "shape": (100, 50, 20), "affine": affine}
+
+        topleft, physical_size_mm = compute_image_geometry(metadata)
+
+        np.testing.assert_array_equal(topleft, [10.0, -20.0, -30.0])
+        self.assertEqual(physical_size_mm, [50.0, 50.0, 40.0])
+
+    def test_compute_image_geometry_keeps_affine(self):
+        """Test that computing the geometry does not modify the caller's affine."""
+        affine = np.array([[1.0, 0, 0, 10.0], [0, 1.0, 0, 20.0], [0, 0, 1.0, 30.0], [0, 0, 0, 1]])
+        original = affine.copy()
+        metadata = {"resolution": (1.0, 1.0, 1.0), "shape": (10, 10, 10), "affine": affine}
+
+        first, _ = compute_image_geometry(metadata)
+        second, _ = compute_image_geometry(metadata)
+
+        np.testing.assert_array_equal(affine, original)
+        np.testing.assert_array_equal(first, second)
+
+    def test_compute_image_geometry_missing_metadata(self):
+        """Test computing the geometry with missing metadata."""
+        with self.assertRaises(ValueError):
+            compute_image_geometry({"resolution": (1.0, 1.0, 1.0), "shape": (10, 10, 10)})
+        with self.assertRaises(ValueError):
+            compute_image_geometry({"affine": np.eye(4)})
+
+    def test_read_roi_json(self):
+        """Test reading the ROI center and size from a JSON file."""
+        json_path = os.path.join(self.test_dir, "liver.json")
+        with open(json_path, 'w') as f:
+            json.dump({"markups": [{"center": [1, 2.5, -3], "size": [4, 5, 6]}]}, f)
+
+        center, size = read_roi_json(json_path)
+
+        self.assertEqual(center, [1.0, 2.5, -3.0])
+        self.assertEqual(size, [4.0, 5.0, 6.0])
+
+    def test_read_roi_json_invalid(self):
+        """Test reading an invalid ROI JSON file."""
+        json_path = os.path.join(self.test_dir, "liver.json")
+        with open(json_path, 'w') as f:
+            f.write("{not valid json")
+
+        with self.assertRaises(ValueError):
+            read_roi_json(json_path)
+
+    def test_parse_roi_data_invalid(self):
+        """Test parsing malformed ROI data."""
+        with self.assertRaises(KeyError):
+            parse_roi_data({"markups": []})
+        with self.assertRaises(KeyError):
+            parse_roi_data({"markups": [{"center": [0, 0, 0]}]})
+        with self.assertRaises(ValueError):
+            parse_roi_data({"markups": [{"center": [0, 0], "size": [1, 1, 1]}]})
+
+    def test_roi_to_yolo_line(self):
+        """Test converting an ROI to a YOLO line."""
+        line = roi_to_yolo_line(2, [-10.0, 20.0, -30.0], [10.0, 20.0, 40.0], [50.0, 50.0, 50.0], [100.0, 100.0, 100.0])
+
+        self.assertEqual(line, "2 0.2 0.4 0.3 0.4 0.1 0.2")
+
+    def test_yolo_roundtrip(self):
+        """Test that yolo_line_to_roi inverts roi_to_yolo_line."""
+        topleft, physical_size_mm = compute_image_geometry({
+            "resolution": (0.8, 0.8, 2.5),
+            "shape": (64, 48, 32),
+            "affine": np.array([[-0.8, 0, 0, 120.0], [0, -0.8, 0, 95.0], [0, 0, 2.5, -210.0], [0, 0, 0, 1]])
+        })
+        center, size = [-5.5, 12.25, -180.0], [8.0, 6.0, 10.0]
+
+        line = roi_to_yolo_line(3, center, size, topleft, physical_size_mm)
+        class_index, roundtrip_center, roundtrip_size = yolo_line_to_roi(line, topleft, physical_size_mm)
+
+        self.assertEqual(class_index, 3)
+        np.testing.assert_allclose(roundtrip_center, center, atol=1e-9)
+        np.testing.assert_allclose(roundtrip_size, size, atol=1e-9)
+
+    def test_yolo_line_to_roi_invalid(self):
+        """Test converting malformed YOLO lines."""
+        with self.assertRaises(ValueError):
+            yolo_line_to_roi("0 0.5 0.5", [0, 0, 0], [1, 1, 1])
+        with self.assertRaises(ValueError):
+            yolo_line_to_roi("0 0.5 0.5 0.5 a 0.1 0.1", [0, 0, 0], [1, 1, 1])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file